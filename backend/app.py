@@ -1,25 +1,23 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, jsonify, request
 from flask_cors import CORS
-from database import get_db, Transaction, TransactionType
-from sqlalchemy import func, case
+from database import get_db, Transaction, TransactionType, Counterparty
+from database.models.base import warm_engine
+from database.partitions import transactions_source
+from money import average_rwf
+from sqlalchemy import func, case, select
 from datetime import datetime
 from contextlib import contextmanager
+from functools import lru_cache
+import orjson
+import os
 
-app = Flask(__name__)
+# Reconciliation and ingest (with the XML parser and worker pool behind
+# them) are imported inside their endpoints, so they stay off the cold-start path.
 
-# Configure CORS to be more permissive for development
-CORS(app, 
-     resources={r"/api/*": {
-         "origins": ["http://localhost:8000", "http://127.0.0.1:8000"],
-         "methods": ["GET", "POST", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Accept"],
-         "supports_credentials": True,
-         "expose_headers": ["Content-Type", "Accept"]
-     }},
-     supports_credentials=True)
+api = Blueprint('api', __name__)
 
 # Add CORS headers to all responses
-@app.after_request
+@api.after_app_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', 'http://localhost:8000')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Accept')
@@ -36,142 +34,205 @@ def get_db_session():
     finally:
         db.close()
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'message': 'API is running'}), 200
 
-@app.route('/api/transactions', methods=['GET'])
+# Fields /api/transactions can return, in response order
+TRANSACTION_FIELDS = (
+    'id', 'transaction_id', 'type_name', 'date', 'amount', 'fee',
+    'balance', 'sender', 'receiver', 'raw_body', 'status'
+)
+
+def transaction_columns(source):
+    """Column expressions for TRANSACTION_FIELDS, read from the transactions table or its pruned partitions"""
+    return {
+        'id': source.c.id,
+        'transaction_id': source.c.transaction_id,
+        'type_name': TransactionType.name,
+        'date': source.c.date,
+        'amount': source.c.amount,
+        # Zero fees and balances are reported as null, as they always have been
+        'fee': func.nullif(source.c.fee, 0),
+        'balance': func.nullif(source.c.balance, 0),
+        'sender': source.c.sender,
+        'receiver': source.c.receiver,
+        'raw_body': source.c.raw_body,
+        'status': source.c.status
+    }
+
+def json_response(payload, status=200):
+    """Encode with orjson, which serializes datetimes natively as local ISO 8601 without a timezone"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+def requested_fields(args):
+    """Resolve the ?fields= / ?exclude= projection, or raise ValueError"""
+    fields = [f for f in args.get('fields', '').split(',') if f] or list(TRANSACTION_FIELDS)
+    excluded = [f for f in args.get('exclude', '').split(',') if f]
+    unknown = [f for f in fields + excluded if f not in TRANSACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    fields = [f for f in fields if f not in excluded]
+    if not fields:
+        raise ValueError('No fields left to return')
+    return fields
+
+def requested_date_range(args):
+    """Parse ?start_date= / ?end_date= (YYYY-MM-DD) into datetimes, or raise ValueError"""
+    try:
+        return tuple(
+            datetime.strptime(args[name], '%Y-%m-%d') if args.get(name) else None
+            for name in ('start_date', 'end_date')
+        )
+    except ValueError:
+        raise ValueError('start_date and end_date must be dates in YYYY-MM-DD format')
+
+@api.route('/api/transactions', methods=['GET'])
 def get_transactions():
     with get_db_session() as db:
         # Get filter parameters from request arguments
         transaction_type = request.args.get('type')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
         search_term = request.args.get('search')
 
-        # Base query
-        query = db.query(
-            Transaction,
-            TransactionType.name.label('type_name')
+        try:
+            fields = requested_fields(request.args)
+            start_date, end_date = requested_date_range(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Only the monthly partitions inside the date range are read
+        source = transactions_source(db.connection(), start_date, end_date)
+        columns = transaction_columns(source)
+
+        # Base query: plain column tuples, no ORM entities to hydrate
+        query = select(
+            *[columns[field] for field in fields]
+        ).select_from(
+            source
         ).join(
             TransactionType,
-            Transaction.type_id == TransactionType.id
+            source.c.type_id == TransactionType.id
         )
 
         # Apply filters
         if transaction_type and transaction_type != 'all':
-            query = query.filter(TransactionType.name == transaction_type)
+            query = query.where(TransactionType.name == transaction_type)
         
         if start_date:
-            query = query.filter(Transaction.date >= datetime.strptime(start_date, '%Y-%m-%d'))
+            query = query.where(source.c.date >= start_date)
             
         if end_date:
-            query = query.filter(Transaction.date <= datetime.strptime(end_date, '%Y-%m-%d'))
+            query = query.where(source.c.date <= end_date)
             
         if search_term:
             search_like = f'%{search_term}%'
-            query = query.filter(
-                (Transaction.raw_body.ilike(search_like)) |
-                (Transaction.sender.ilike(search_like)) |
-                (Transaction.receiver.ilike(search_like))
+            query = query.where(
+                (source.c.raw_body.ilike(search_like)) |
+                (source.c.sender.ilike(search_like)) |
+                (source.c.receiver.ilike(search_like))
             )
 
         # Order by date descending
-        query = query.order_by(Transaction.date.desc())
+        query = query.order_by(source.c.date.desc())
         
         # Execute query and format results
-        transactions = query.all()
-        result = []
-        for transaction, type_name in transactions:
-            transaction_dict = {
-                'id': transaction.id,
-                'transaction_id': transaction.transaction_id,
-                'type_name': type_name,
-                'date': transaction.date.isoformat(),
-                'amount': float(transaction.amount),
-                'fee': float(transaction.fee) if transaction.fee else None,
-                'balance': float(transaction.balance) if transaction.balance else None,
-                'sender': transaction.sender,
-                'receiver': transaction.receiver,
-                'raw_body': transaction.raw_body,
-                'status': transaction.status
-            }
-            result.append(transaction_dict)
-
-        return jsonify(result)
-
-@app.route('/api/summary', methods=['GET'])
+        rows = db.execute(query)
+        return json_response([dict(zip(fields, row)) for row in rows])
+
+@lru_cache(maxsize=None)
+def summary_statements():
+    """
+    Build the fixed get_summary queries once.
+
+    Reusing the same statement objects means their cache keys are only
+    generated once, and every request after the first is served from
+    SQLAlchemy's compiled statement cache.
+    """
+    # Overall statistics; money columns are whole RWF, so the sums are exact
+    # integers and the average is derived from them instead of a float AVG()
+    overall_stats = select(
+        func.count(Transaction.id).label('total_transactions'),
+        func.coalesce(func.sum(Transaction.amount), 0).label('total_amount'),
+        func.coalesce(func.sum(Transaction.fee), 0).label('total_fees')
+    )
+
+    # Transactions by type
+    transactions_by_type = select(
+        TransactionType.name,
+        func.count(Transaction.id).label('count')
+    ).select_from(
+        TransactionType
+    ).join(
+        Transaction,
+        Transaction.type_id == TransactionType.id
+    ).group_by(
+        TransactionType.name
+    ).order_by(
+        func.count(Transaction.id).desc()
+    )
+
+    # Monthly transaction volume
+    monthly_volume = select(
+        func.strftime('%Y-%m', Transaction.date).label('month'),
+        func.sum(Transaction.amount).label('total_amount')
+    ).group_by(
+        func.strftime('%Y-%m', Transaction.date)
+    ).order_by(
+        func.strftime('%Y-%m', Transaction.date)
+    )
+
+    # Payments vs. Deposits
+    payments_deposits = select(
+        case(
+            (TransactionType.name.in_(['Incoming Money', 'Bank Deposits']), 'Deposits'),
+            else_='Payments'
+        ).label('category'),
+        func.sum(Transaction.amount).label('total_amount')
+    ).select_from(
+        Transaction
+    ).join(
+        TransactionType,
+        Transaction.type_id == TransactionType.id
+    ).group_by(
+        'category'
+    )
+
+    return overall_stats, transactions_by_type, monthly_volume, payments_deposits
+
+@api.route('/api/summary', methods=['GET'])
 def get_summary():
+    overall_stats_query, transactions_by_type_query, monthly_volume_query, payments_deposits_query = summary_statements()
+
     with get_db_session() as db:
-        # Overall statistics
-        overall_stats = db.query(
-            func.count(Transaction.id).label('total_transactions'),
-            func.sum(Transaction.amount).label('total_amount'),
-            func.avg(Transaction.amount).label('avg_amount'),
-            func.sum(Transaction.fee).label('total_fees')
-        ).first()
-
-        # Transactions by type
-        transactions_by_type = db.query(
-            TransactionType.name,
-            func.count(Transaction.id).label('count')
-        ).join(
-            Transaction,
-            Transaction.type_id == TransactionType.id
-        ).group_by(
-            TransactionType.name
-        ).order_by(
-            func.count(Transaction.id).desc()
-        ).all()
-
-        # Monthly transaction volume
-        monthly_volume = db.query(
-            func.strftime('%Y-%m', Transaction.date).label('month'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).group_by(
-            func.strftime('%Y-%m', Transaction.date)
-        ).order_by(
-            func.strftime('%Y-%m', Transaction.date)
-        ).all()
-
-        # Payments vs. Deposits
-        payments_deposits = db.query(
-            case(
-                (TransactionType.name.in_(['Incoming Money', 'Bank Deposits']), 'Deposits'),
-                else_='Payments'
-            ).label('category'),
-            func.sum(Transaction.amount).label('total_amount')
-        ).join(
-            TransactionType,
-            Transaction.type_id == TransactionType.id
-        ).group_by(
-            'category'
-        ).all()
+        overall_stats = db.execute(overall_stats_query).first()
+        transactions_by_type = db.execute(transactions_by_type_query).all()
+        monthly_volume = db.execute(monthly_volume_query).all()
+        payments_deposits = db.execute(payments_deposits_query).all()
 
         summary_data = {
             'total_stats': {
                 'total_transactions': overall_stats.total_transactions,
-                'total_amount': float(overall_stats.total_amount) if overall_stats.total_amount else 0,
-                'avg_amount': float(overall_stats.avg_amount) if overall_stats.avg_amount else 0,
-                'total_fees': float(overall_stats.total_fees) if overall_stats.total_fees else 0
+                'total_amount': overall_stats.total_amount,
+                'avg_amount': average_rwf(overall_stats.total_amount, overall_stats.total_transactions),
+                'total_fees': overall_stats.total_fees
             },
             'transactions_by_type': [
                 {'name': name, 'count': count}
                 for name, count in transactions_by_type
             ],
             'monthly_volume': [
-                {'month': month, 'total_amount': float(total_amount)}
+                {'month': month, 'total_amount': total_amount}
                 for month, total_amount in monthly_volume
             ],
             'payments_deposits': [
-                {'category': category, 'total_amount': float(total_amount)}
+                {'category': category, 'total_amount': total_amount}
                 for category, total_amount in payments_deposits
             ]
         }
         
         return jsonify(summary_data)
 
-@app.route('/api/transaction-types', methods=['GET'])
+@api.route('/api/transaction-types', methods=['GET'])
 def get_transaction_types():
     with get_db_session() as db:
         transaction_types = db.query(TransactionType).all()
@@ -180,5 +241,135 @@ def get_transaction_types():
             'name': t.name
         } for t in transaction_types])
 
+@api.route('/api/counterparties/top', methods=['GET'])
+def get_top_counterparties():
+    with get_db_session() as db:
+        # 'receiver' answers who we pay most, 'sender' who pays us most
+        role = request.args.get('role', 'receiver')
+        order_by = request.args.get('by', 'volume')
+
+        if role not in ('sender', 'receiver'):
+            return jsonify({'error': "role must be 'sender' or 'receiver'"}), 400
+        if order_by not in ('volume', 'count'):
+            return jsonify({'error': "by must be 'volume' or 'count'"}), 400
+        # SQLite treats a negative LIMIT as no limit, so anything but a positive count is an error
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({'error': 'limit must be a positive whole number'}), 400
+        try:
+            start_date, end_date = requested_date_range(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Aggregate on the interned ID so the (id, date, amount) index covers the scan
+        source = transactions_source(db.connection(), start_date, end_date)
+        counterparty_id = source.c.sender_id if role == 'sender' else source.c.receiver_id
+        totals = db.query(
+            counterparty_id.label('counterparty_id'),
+            func.count(source.c.id).label('count'),
+            func.sum(source.c.amount).label('total_amount')
+        ).filter(
+            counterparty_id.isnot(None)
+        )
+
+        if start_date:
+            totals = totals.filter(source.c.date >= start_date)
+
+        if end_date:
+            totals = totals.filter(source.c.date <= end_date)
+
+        totals = totals.group_by(counterparty_id).subquery()
+        ranking = totals.c.total_amount if order_by == 'volume' else totals.c.count
+
+        top_counterparties = db.query(
+            Counterparty.id,
+            Counterparty.name,
+            totals.c.count,
+            totals.c.total_amount
+        ).join(
+            totals,
+            totals.c.counterparty_id == Counterparty.id
+        ).order_by(
+            ranking.desc()
+        ).limit(limit).all()
+
+        return jsonify([{
+            'id': party_id,
+            'name': name,
+            'count': count,
+            'total_amount': total_amount or 0
+        } for party_id, name, count, total_amount in top_counterparties])
+
+@api.route('/api/reconciliation', methods=['GET'])
+def get_reconciliation():
+    from reconcile import reconcile_balances, DEFAULT_TOLERANCE
+
+    with get_db_session() as db:
+        # Amounts are whole RWF; a fractional or negative tolerance is an error, not the default
+        try:
+            tolerance = int(request.args.get('tolerance', DEFAULT_TOLERANCE))
+        except ValueError:
+            tolerance = -1
+        if tolerance < 0:
+            return jsonify({'error': 'tolerance must be a whole number of RWF'}), 400
+        return jsonify(reconcile_balances(db, tolerance))
+
+@api.route('/api/ingest', methods=['POST'])
+def start_ingest():
+    import tempfile
+    from ingest import resolve_ingest_path, submit_ingest
+
+    # Either an uploaded XML export or the path of one already on the server
+    upload = request.files.get('file')
+    if upload:
+        fd, xml_path = tempfile.mkstemp(suffix='.xml', prefix='ingest_')
+        with os.fdopen(fd, 'wb') as f:
+            upload.save(f)
+        job = submit_ingest(xml_path, source=upload.filename, remove_when_done=True)
+    else:
+        payload = request.get_json(silent=True)
+        xml_path = (payload.get('path') if isinstance(payload, dict) else None) or request.form.get('path')
+        # Symlinks and '..' are resolved first, so nothing outside the ingest directory can be loaded
+        xml_path = resolve_ingest_path(xml_path) if xml_path else None
+        if not xml_path:
+            return jsonify({'error': 'Provide an XML file upload or the path of an XML file in the ingest directory'}), 400
+        job = submit_ingest(xml_path)
+
+    return jsonify(job.to_dict()), 202
+
+@api.route('/api/ingest/<job_id>', methods=['GET'])
+def get_ingest_status(job_id):
+    from ingest import get_job
+
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown ingest job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+def create_app():
+    """Build the Flask app and open the database connection before the first request"""
+    app = Flask(__name__)
+
+    # Configure CORS to be more permissive for development
+    CORS(app, 
+         resources={r"/api/*": {
+             "origins": ["http://localhost:8000", "http://127.0.0.1:8000"],
+             "methods": ["GET", "POST", "OPTIONS"],
+             "allow_headers": ["Content-Type", "Accept"],
+             "supports_credentials": True,
+             "expose_headers": ["Content-Type", "Accept"]
+         }},
+         supports_credentials=True)
+
+    app.register_blueprint(api)
+    warm_engine()
+    summary_statements()
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
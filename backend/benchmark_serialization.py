@@ -0,0 +1,131 @@
+"""
+Compare the per-row cost of serializing /api/transactions.
+
+Usage:
+    python benchmark_serialization.py [--rows 50000] [--repeat 3]
+
+Loads synthetic transactions into a throwaway SQLite database and times the
+previous ORM-hydration path against the Core column-tuple path used by the
+endpoint now, with and without raw_body.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# The app binds to DATABASE_URL on import, so the throwaway database must be set first
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'benchmark.db')}"
+
+from flask import jsonify
+from database import Transaction, TransactionType, engine
+from database.init_db import init_db, seed_transaction_types
+from database.models.base import SessionLocal
+import app as api_app
+
+
+def load_rows(count: int) -> None:
+    """Insert synthetic transactions that look like parsed MoMo messages"""
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_transaction_types(db)
+    finally:
+        db.close()
+
+    start = datetime(2024, 5, 10, 9, 0, 0)
+    rows = [{
+        'transaction_id': str(70000000000 + i),
+        'type_id': 1 + i % 8,
+        'date': start + timedelta(minutes=i),
+        'amount': 100 + i % 5000,
+        'fee': i % 3 * 50,
+        'balance': 10000 + i,
+        'sender': 'Jane Smith' if i % 2 else 'You',
+        'receiver': 'You' if i % 2 else 'Samuel Carter',
+        'raw_body': f"TxId: {70000000000 + i}. Your payment of {100 + i % 5000} RWF to Samuel Carter has been completed. "
+                    f"Your new balance: {10000 + i} RWF. Fee was 0 RWF.",
+        'status': 'Processed'
+    } for i in range(count)]
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), rows)
+
+
+def orm_serialize():
+    """The previous /api/transactions body: hydrate entities, convert each field by hand"""
+    db = SessionLocal()
+    try:
+        transactions = db.query(
+            Transaction,
+            TransactionType.name.label('type_name')
+        ).join(
+            TransactionType,
+            Transaction.type_id == TransactionType.id
+        ).order_by(Transaction.date.desc()).all()
+
+        result = []
+        for transaction, type_name in transactions:
+            result.append({
+                'id': transaction.id,
+                'transaction_id': transaction.transaction_id,
+                'type_name': type_name,
+                'date': transaction.date.isoformat(),
+                'amount': float(transaction.amount),
+                'fee': float(transaction.fee) if transaction.fee else None,
+                'balance': float(transaction.balance) if transaction.balance else None,
+                'sender': transaction.sender,
+                'receiver': transaction.receiver,
+                'raw_body': transaction.raw_body,
+                'status': transaction.status
+            })
+        return jsonify(result).get_data()
+    finally:
+        db.close()
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    load_rows(args.rows)
+    client = api_app.app.test_client()
+
+    try:
+        run_cases(client, args.rows, args.repeat)
+    finally:
+        engine.dispose()
+        shutil.rmtree(_db_dir, ignore_errors=True)
+
+
+def run_cases(client, rows: int, repeat: int) -> None:
+    with api_app.app.test_request_context():
+        cases = [
+            ('ORM hydration (previous)', orm_serialize),
+            ('Core tuples, all fields', lambda: client.get('/api/transactions').get_data()),
+            ('Core tuples, exclude=raw_body', lambda: client.get('/api/transactions?exclude=raw_body').get_data()),
+        ]
+
+        print(f"Serializing {rows} transactions (best of {repeat}):")
+        baseline = None
+        for name, func in cases:
+            elapsed = best_of(repeat, func)
+            per_row = elapsed / rows * 1e6
+            baseline = baseline or per_row
+            print(f"  {name:<32} {elapsed:7.3f} s  {per_row:6.2f} us/row  {baseline / per_row:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import logging
+
+from database import engine
+from database.partitions import PARTITION_BY_MONTH, compact_old_partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old monthly transaction partitions and make them read-only")
+    parser.add_argument('--keep-months', type=int, default=2,
+                        help="Number of most recent months to leave writable (default: 2)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if not PARTITION_BY_MONTH:
+        print("Monthly partitioning is disabled; set PARTITION_BY_MONTH=1 to use it.")
+        return
+
+    try:
+        with engine.begin() as conn:
+            compacted = compact_old_partitions(conn, args.keep_months)
+
+        # Hand the pages freed by the rewrites back to the filesystem
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+
+        print(f"Compacted {len(compacted)} partitions: {', '.join(compacted) or 'none'}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        logging.error(f"Partition compaction error: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
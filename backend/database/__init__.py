@@ -1,4 +1,4 @@
 from .models.base import Base, engine, get_db
-from .models.transaction import Transaction, TransactionType
+from .models.transaction import Transaction, TransactionType, Counterparty
 
-__all__ = ['Base', 'engine', 'get_db', 'Transaction', 'TransactionType'] 
\ No newline at end of file
+__all__ = ['Base', 'engine', 'get_db', 'Transaction', 'TransactionType', 'Counterparty'] 
\ No newline at end of file
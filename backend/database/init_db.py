@@ -1,6 +1,11 @@
 import logging
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
-from .models import Base, engine, TransactionType, Transaction
+from sqlalchemy.schema import CreateIndex
+from .models import Base, engine, TransactionType, Transaction, Counterparty
+from . import migrations, partitions
+from money import to_rwf
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 import json
 import os
@@ -24,11 +29,211 @@ def get_default_transaction_types():
         "Unknown"
     ]
 
+def normalize_counterparty_name(name: Optional[str]) -> Optional[str]:
+    """Return the canonical form of a counterparty name, or None for the account holder"""
+    if not name:
+        return None
+    name = ' '.join(name.split())
+    if not name or name == 'You':
+        return None
+    return name[:100]
+
+def get_counterparty_ids(db: Session, names: Iterable[Optional[str]], cache: Dict[str, int]) -> Dict[str, int]:
+    """
+    Resolve a batch of counterparty names to IDs for bulk inserts.
+
+    Names missing from the cache are looked up in one query; the ones that
+    still do not exist are inserted and flushed so they get their IDs.
+    """
+    missing = {normalize_counterparty_name(name) for name in names} - set(cache) - {None}
+    if missing:
+        for counterparty in db.query(Counterparty).filter(Counterparty.name.in_(missing)):
+            cache[counterparty.name] = counterparty.id
+            missing.discard(counterparty.name)
+
+        new_counterparties = [Counterparty(name=name) for name in sorted(missing)]
+        db.add_all(new_counterparties)
+        db.flush()
+        cache.update({c.name: c.id for c in new_counterparties})
+    return cache
+
+def attach_counterparty_ids(db: Session, rows: List[Dict[str, Any]], cache: Dict[str, int]) -> None:
+    """Fill in sender_id/receiver_id on transaction rows from their sender/receiver names"""
+    get_counterparty_ids(db, [row['sender'] for row in rows] + [row['receiver'] for row in rows], cache)
+    for row in rows:
+        row['sender_id'] = cache.get(normalize_counterparty_name(row['sender']))
+        row['receiver_id'] = cache.get(normalize_counterparty_name(row['receiver']))
+
+def upgrade_counterparty_columns(bind) -> bool:
+    """
+    Add sender_id/receiver_id to a transactions table created before counterparties were interned.
+
+    The columns and any missing indexes are added, then filled in by
+    interning the stored sender/receiver names, all in one transaction.
+    Returns whether the table needed upgrading.
+    """
+    live = Transaction.__table__
+    db = Session(bind=bind)
+    try:
+        conn = db.connection()
+        is_table = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (live.name,)
+        ).first()
+        columns = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({live.name})')}
+        if not is_table or 'sender_id' in columns:
+            return False
+
+        for column in ('sender_id', 'receiver_id'):
+            conn.exec_driver_sql(f'ALTER TABLE {live.name} ADD COLUMN {column} INTEGER REFERENCES counterparties (id)')
+        indexes = {row[1] for row in conn.exec_driver_sql(f'PRAGMA index_list({live.name})')}
+        for index in live.indexes:
+            if index.name not in indexes:
+                conn.execute(CreateIndex(index))
+
+        cache: Dict[str, int] = {}
+        for role, name_column, id_column in (
+            ('sender', live.c.sender, 'sender_id'),
+            ('receiver', live.c.receiver, 'receiver_id'),
+        ):
+            names = [name for name in db.execute(select(name_column).distinct()).scalars() if name]
+            get_counterparty_ids(db, names, cache)
+            updates = [
+                {'stored_name': name, 'party_id': cache[normalize_counterparty_name(name)]}
+                for name in names if normalize_counterparty_name(name)
+            ]
+            if updates:
+                db.execute(
+                    live.update().where(name_column == bindparam('stored_name')).values({id_column: bindparam('party_id')}),
+                    updates
+                )
+        db.commit()
+        logging.info(f"Added interned counterparties to {live.name}")
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def split_read_only_rows(db: Session, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separate rows that can be inserted from rows for compacted, read-only months"""
+    if not partitions.PARTITION_BY_MONTH:
+        return rows, []
+    return partitions.split_read_only(db.connection(), rows)
+
+def remove_stored_rows(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop rows whose message is already stored, or repeated earlier in the batch.
+
+    Many messages carry no transaction ID, so they are matched on the SMS
+    itself: the same message always has the same date and body. The lookup
+    goes through the date index (and, when partitioned, only the months
+    the batch covers).
+    """
+    if not rows:
+        return rows
+    dates = {row['date'] for row in rows}
+    source = partitions.transactions_source(db.connection(), min(dates), max(dates))
+    seen = {
+        (date, raw_body) for date, raw_body in
+        db.execute(select(source.c.date, source.c.raw_body).where(source.c.date.in_(dates)))
+    }
+
+    new_rows = []
+    for row in rows:
+        key = (row['date'], row['raw_body'])
+        if key not in seen:
+            seen.add(key)
+            new_rows.append(row)
+    return new_rows
+
+def insert_transaction_rows(db: Session, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> int:
+    """
+    Bulk insert validated rows into the transactions table, or its monthly partitions.
+
+    With ignore_duplicates, rows whose transaction_id is already stored are
+    skipped instead of failing the batch. Returns the number of rows inserted.
+    """
+    if partitions.PARTITION_BY_MONTH:
+        return partitions.insert_rows(db.connection(), rows, ignore_duplicates)
+    statement = Transaction.__table__.insert()
+    if ignore_duplicates:
+        statement = statement.prefix_with('OR IGNORE')
+    return db.execute(statement, rows).rowcount
+
+def build_transaction_row(tx_data: Dict[str, Any], type_mapping: Dict[str, int]) -> Dict[str, Any]:
+    """Validate one processed transaction and return its column values"""
+    # Validate required fields
+    required_fields = ['transaction_id', 'type', 'date', 'amount', 'raw_body', 'status']
+    missing_fields = [field for field in required_fields if field not in tx_data]
+    if missing_fields:
+        raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+
+    # Convert date string to datetime object
+    try:
+        tx_date = datetime.strptime(tx_data['date'], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ValueError(f"Invalid date format: {tx_data['date']}")
+
+    # Validate transaction type
+    if tx_data['type'] not in type_mapping:
+        raise ValueError(f"Invalid transaction type: {tx_data['type']}")
+
+    # Validate numeric fields; amounts are stored as whole RWF
+    try:
+        amount = to_rwf(tx_data['amount'])
+        fee = to_rwf(tx_data['fee']) if tx_data.get('fee') else 0
+        balance = to_rwf(tx_data['balance']) if tx_data.get('balance') else None
+    except ValueError:
+        raise ValueError(f"Invalid numeric value in transaction {tx_data['transaction_id']}")
+
+    return {
+        'transaction_id': tx_data['transaction_id'],
+        'type_id': type_mapping[tx_data['type']],
+        'date': tx_date,
+        'amount': amount,
+        'fee': fee,
+        'balance': balance,
+        'sender': tx_data.get('sender'),
+        'receiver': tx_data.get('receiver'),
+        'raw_body': tx_data['raw_body'],
+        'status': tx_data['status']
+    }
+
+def create_tables(bind):
+    """
+    Create all tables and upgrade existing ones to the current layout.
+
+    With monthly partitioning, transactions becomes a view over them.
+    """
+    if not partitions.PARTITION_BY_MONTH:
+        Base.metadata.create_all(bind=bind)
+        upgrade_counterparty_columns(bind)
+        with bind.begin() as conn:
+            migrations.migrate_money_to_integers(conn)
+        return
+
+    live = Transaction.__table__
+    Base.metadata.create_all(bind=bind, tables=[t for t in Base.metadata.sorted_tables if t is not live])
+    upgrade_counterparty_columns(bind)
+    with bind.begin() as conn:
+        migrations.migrate_money_to_integers(conn)
+        existing = conn.exec_driver_sql(
+            "SELECT type FROM sqlite_master WHERE name = ?", (live.name,)
+        ).scalar()
+        if existing == 'table':
+            # Move an unpartitioned database's rows into monthly partitions
+            conn.exec_driver_sql(f'ALTER TABLE {live.name} RENAME TO {live.name}_unpartitioned')
+            partitions.replace_from(conn, partitions.copy_transactions_table(f'{live.name}_unpartitioned'))
+            logging.info("Moved existing transactions into monthly partitions")
+        elif existing is None:
+            partitions.rebuild_view(conn)
+
 def init_db():
     """Initialize the database and create tables"""
     try:
         # Create all tables
-        Base.metadata.create_all(bind=engine)
+        create_tables(engine)
         logging.info("Database tables created successfully")
     except Exception as e:
         logging.error(f"Error creating database tables: {str(e)}")
@@ -72,52 +277,18 @@ def load_transactions(db: Session, json_file_path: str):
         type_mapping = {t.name: t.id for t in db.query(TransactionType).all()}
 
         # Process each transaction
+        rows = []
         for tx_data in transactions_data:
             try:
-                # Validate required fields
-                required_fields = ['transaction_id', 'type', 'date', 'amount', 'raw_body', 'status']
-                missing_fields = [field for field in required_fields if field not in tx_data]
-                if missing_fields:
-                    raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
-
-                # Convert date string to datetime object
-                try:
-                    tx_date = datetime.strptime(tx_data['date'], '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    raise ValueError(f"Invalid date format: {tx_data['date']}")
-
-                # Validate transaction type
-                if tx_data['type'] not in type_mapping:
-                    raise ValueError(f"Invalid transaction type: {tx_data['type']}")
-
-                # Validate numeric fields
-                try:
-                    amount = float(tx_data['amount'])
-                    fee = float(tx_data['fee']) if tx_data.get('fee') else 0.0
-                    balance = float(tx_data['balance']) if tx_data.get('balance') else None
-                except (ValueError, TypeError):
-                    raise ValueError(f"Invalid numeric value in transaction {tx_data['transaction_id']}")
-
-                # Create transaction record
-                transaction = Transaction(
-                    transaction_id=tx_data['transaction_id'],
-                    type_id=type_mapping[tx_data['type']],
-                    date=tx_date,
-                    amount=amount,
-                    fee=fee,
-                    balance=balance,
-                    sender=tx_data.get('sender'),
-                    receiver=tx_data.get('receiver'),
-                    raw_body=tx_data['raw_body'],
-                    status=tx_data['status']
-                )
-                db.add(transaction)
+                rows.append(build_transaction_row(tx_data, type_mapping))
 
             except ValueError as e:
                 logging.error(f"Error processing transaction: {str(e)}")
                 raise  # Re-raise the ValueError to be caught by the caller
 
-        # Commit all transactions
+        # Intern counterparties, then insert all transactions in bulk
+        attach_counterparty_ids(db, rows, {})
+        insert_transaction_rows(db, rows)
         db.commit()
         logging.info(f"Successfully loaded {len(transactions_data)} transactions")
 
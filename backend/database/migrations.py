@@ -0,0 +1,101 @@
+"""
+In-place upgrades for databases created by earlier versions.
+
+SQLite cannot change a column's type, so upgrades rebuild the affected
+tables: create the new layout under a temporary name, copy the rows
+across, drop the old table and rename the new one into place.
+"""
+import logging
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from . import partitions
+
+MONEY_COLUMNS = ('amount', 'fee', 'balance')
+
+
+def _live_type(conn) -> str:
+    """Whether transactions is currently a 'table', a 'view' or missing (None)"""
+    return conn.exec_driver_sql(
+        "SELECT type FROM sqlite_master WHERE name = ?", (partitions.VIEW_NAME,)
+    ).scalar()
+
+
+def _transaction_tables(conn) -> List[Tuple[str, bool]]:
+    """The live transactions table, if it is a table, and every monthly partition, with whether each is read-only"""
+    tables = [
+        (partitions.partition_name(month), partitions.is_read_only(conn, month))
+        for month in partitions.list_partitions(conn)
+    ]
+    return [(partitions.VIEW_NAME, False)] + tables if _live_type(conn) == 'table' else tables
+
+
+def _column_types(conn, name: str) -> Dict[str, str]:
+    """The columns a table really has on disk, which may predate the current model"""
+    return {row[1]: row[2].upper() for row in conn.exec_driver_sql(f'PRAGMA table_info({name})')}
+
+
+def _has_fractional_money_columns(conn, name: str) -> bool:
+    return any(_column_types(conn, name).get(column, 'INTEGER') != 'INTEGER' for column in MONEY_COLUMNS)
+
+
+def fractional_money_tables(conn) -> List[str]:
+    """Transaction tables that still store amounts in Float columns"""
+    return [name for name, _ in _transaction_tables(conn) if _has_fractional_money_columns(conn, name)]
+
+
+def _rebuild_with_integer_money(conn, name: str, read_only: bool) -> None:
+    """
+    Copy a transactions table into one with INTEGER money columns, rounding to whole RWF.
+
+    Only the columns the old table really has are copied; columns added
+    since then keep their defaults in the rebuilt table.
+    """
+    old = partitions.copy_transactions_table(name)
+    existing = _column_types(conn, name)
+    copied = [column for column in old.columns if column.name in existing]
+    rebuilt = partitions.copy_transactions_table(f'{name}_integer_money')
+    conn.execute(CreateTable(rebuilt))
+    conn.execute(rebuilt.insert().from_select(
+        [column.name for column in copied],
+        select(*[
+            # ROUND rounds halves away from zero, like money.to_rwf
+            cast(func.round(column), Integer).label(column.name) if column.name in MONEY_COLUMNS else column
+            for column in copied
+        ])
+    ))
+
+    # SQLite refuses to rename while a view points at a missing table
+    partitions.drop_view(conn)
+    conn.exec_driver_sql(f'DROP TABLE {name}')
+    conn.exec_driver_sql(f'ALTER TABLE {rebuilt.name} RENAME TO {name}')
+    for index in old.indexes:
+        conn.execute(CreateIndex(index))
+    if read_only:
+        partitions.add_read_only_triggers(conn, name)
+
+
+def migrate_money_to_integers(conn) -> List[str]:
+    """
+    Convert Float amount, fee and balance columns to integer RWF.
+
+    Covers the unpartitioned table and every monthly partition (keeping
+    compacted months read-only). Tables that already use INTEGER are left
+    alone, so this is safe to run on every start.
+
+    Returns:
+        List[str]: Names of the tables that were converted
+    """
+    had_view = _live_type(conn) == 'view'
+    converted = []
+    for name, read_only in _transaction_tables(conn):
+        if _has_fractional_money_columns(conn, name):
+            _rebuild_with_integer_money(conn, name, read_only)
+            converted.append(name)
+            logging.info(f"Converted money columns of {name} to integer RWF")
+
+    if had_view and converted:
+        partitions.rebuild_view(conn)
+    return converted
@@ -1,4 +1,4 @@
-from .transaction import Transaction, TransactionType
+from .transaction import Transaction, TransactionType, Counterparty
 from .base import Base, engine, get_db
 
-__all__ = ['Transaction', 'TransactionType', 'Base', 'engine', 'get_db'] 
\ No newline at end of file
+__all__ = ['Transaction', 'TransactionType', 'Counterparty', 'Base', 'engine', 'get_db'] 
\ No newline at end of file
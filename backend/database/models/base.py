@@ -1,6 +1,7 @@
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import configure_mappers, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 
 # Create base class for declarative models
@@ -9,8 +10,41 @@ Base = declarative_base()
 # Database configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///sms_data.db')
 
+def create_database_engine(database_url: str):
+    """Create an engine, tuned for concurrent reads and loads on SQLite"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        # Keep connections open between requests instead of reconnecting
+        # each time (pysqlite's default for files is NullPool)
+        engine = create_engine(url, poolclass=QueuePool, connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(url)
+
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def configure_sqlite_connection(dbapi_connection, connection_record):
+            """Use WAL so reads never wait on a load, and let SQLAlchemy own transactions"""
+            # pysqlite only opens transactions before DML, which would make
+            # DROP/ALTER TABLE autocommit; BEGIN is emitted in the hook below instead
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.close()
+
+        @event.listens_for(engine, 'begin')
+        def begin_sqlite_transaction(conn):
+            conn.exec_driver_sql('BEGIN')
+
+    return engine
+
 # Create engine
-engine = create_engine(DATABASE_URL)
+engine = create_database_engine(DATABASE_URL)
+
+def warm_engine():
+    """Open a pooled connection and configure the ORM mappers ahead of the first request"""
+    configure_mappers()
+    with engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -21,4 +55,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
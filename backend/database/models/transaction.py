@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .base import Base
@@ -16,24 +16,46 @@ class TransactionType(Base):
     def __repr__(self):
         return f"<TransactionType(name='{self.name}')>"
 
+class Counterparty(Base):
+    """Model for the people and businesses on the other side of a transaction"""
+    __tablename__ = 'counterparties'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<Counterparty(name='{self.name}')>"
+
 class Transaction(Base):
     """Model for transactions"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Covering indexes for per-counterparty aggregates over a date range
+        Index('ix_transactions_sender_date', 'sender_id', 'date', 'amount'),
+        Index('ix_transactions_receiver_date', 'receiver_id', 'date', 'amount'),
+    )
 
     id = Column(Integer, primary_key=True)
     transaction_id = Column(String(50), unique=True, nullable=True)
     type_id = Column(Integer, ForeignKey('transaction_types.id'), nullable=False)
-    date = Column(DateTime, nullable=False)
-    amount = Column(Float, nullable=False)
-    fee = Column(Float, default=0.0)
-    balance = Column(Float, nullable=True)
+    date = Column(DateTime, nullable=False, index=True)
+    # Money columns hold whole RWF (see money.py), so sums are exact
+    amount = Column(Integer, nullable=False)
+    fee = Column(Integer, default=0)
+    balance = Column(Integer, nullable=True)
     sender = Column(String(100), nullable=True)
     receiver = Column(String(100), nullable=True)
+    sender_id = Column(Integer, ForeignKey('counterparties.id'), nullable=True)
+    receiver_id = Column(Integer, ForeignKey('counterparties.id'), nullable=True)
     raw_body = Column(String(500), nullable=False)
     status = Column(String(20), nullable=False)
 
     # Relationship with transaction type
     type = relationship("TransactionType", back_populates="transactions")
 
+    # Interned counterparties; None when that side is the account holder
+    sender_party = relationship("Counterparty", foreign_keys=[sender_id])
+    receiver_party = relationship("Counterparty", foreign_keys=[receiver_id])
+
     def __repr__(self):
         return f"<Transaction(id={self.id}, type='{self.type.name}', amount={self.amount})>" 
\ No newline at end of file
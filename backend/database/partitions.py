@@ -0,0 +1,275 @@
+"""
+Monthly partitioning for the transactions table.
+
+With PARTITION_BY_MONTH enabled, rows live in one table per month
+(transactions_2024_05, ...) and ``transactions`` becomes a UNION ALL view
+over them, so every existing read keeps working unchanged. Writes are
+routed to the right month, date-filtered queries can skip months outside
+their range, and old months can be compacted and made read-only.
+"""
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Index, MetaData, Table, false, func, literal_column, select, union_all
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .models import Transaction
+
+PARTITION_BY_MONTH = os.getenv('PARTITION_BY_MONTH', '').lower() in ('1', 'true', 'yes')
+
+VIEW_NAME = Transaction.__table__.name
+_PARTITION_NAME = re.compile(rf'^{VIEW_NAME}_(\d{{4}})_(\d{{2}})$')
+
+
+def partition_name(month: str) -> str:
+    """Table name for a 'YYYY-MM' month"""
+    return f"{VIEW_NAME}_{month.replace('-', '_')}"
+
+
+def month_of(date: datetime) -> str:
+    return date.strftime('%Y-%m')
+
+
+def copy_transactions_table(name: str, metadata: Optional[MetaData] = None) -> Table:
+    """
+    A copy of the transactions table under another name.
+
+    Index names are global in SQLite, so the copy gets its own
+    (ix_transactions_2024_05_date, ...) instead of sharing the originals.
+    """
+    metadata = metadata or MetaData()
+    source = Transaction.__table__
+    # Referenced tables come along so the foreign keys resolve
+    for table in source.metadata.sorted_tables:
+        if table is not source and table.name not in metadata.tables:
+            table.to_metadata(metadata)
+
+    table = source.to_metadata(metadata, name=name)
+    for index in list(table.indexes):
+        table.indexes.discard(index)
+        Index(
+            index.name.replace(source.name, name, 1),
+            *[table.c[column.name] for column in index.columns],
+            unique=index.unique
+        )
+    return table
+
+
+def list_partitions(conn) -> List[str]:
+    """Months that have a partition, oldest first"""
+    names = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(f"{match.group(1)}-{match.group(2)}")
+    return sorted(months)
+
+
+def _empty_select():
+    """A row-less select with the transactions columns, for when no month matches"""
+    return select(
+        *[literal_column('NULL', type_=column.type).label(column.name) for column in Transaction.__table__.columns]
+    ).where(false())
+
+
+def _union_of(months: Iterable[str]):
+    metadata = MetaData()
+    selects = [select(copy_transactions_table(partition_name(month), metadata)) for month in months]
+    if not selects:
+        return _empty_select()
+    return selects[0] if len(selects) == 1 else union_all(*selects)
+
+
+def is_partitioned(conn) -> bool:
+    """Whether transactions is the view over monthly partitions, rather than a plain table"""
+    is_view = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (VIEW_NAME,)
+    ).first()
+    return is_view is not None
+
+
+def drop_view(conn) -> None:
+    """Drop the transactions view, if transactions is currently a view"""
+    # DROP VIEW IF EXISTS still fails when the name belongs to a table
+    if is_partitioned(conn):
+        conn.exec_driver_sql(f'DROP VIEW {VIEW_NAME}')
+
+
+def rebuild_view(conn) -> None:
+    """Point the transactions view at the current set of partitions"""
+    union = _union_of(list_partitions(conn)).compile(conn, compile_kwargs={'literal_binds': True})
+    drop_view(conn)
+    conn.exec_driver_sql(f'CREATE VIEW {VIEW_NAME} AS {union}')
+
+
+def ensure_partition(conn, month: str) -> Table:
+    """Create the partition for a month, if it is new, and return it"""
+    table = copy_transactions_table(partition_name(month))
+    if month not in list_partitions(conn):
+        conn.execute(CreateTable(table))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index))
+        rebuild_view(conn)
+        logging.info(f"Created partition {table.name}")
+    return table
+
+
+def _next_id(conn) -> int:
+    """One past the highest ID in any partition"""
+    # MAX(id) on each table is a rowid lookup; on the view it scans every month
+    highest = 0
+    for month in list_partitions(conn):
+        highest = max(highest, conn.exec_driver_sql(f'SELECT MAX(id) FROM {partition_name(month)}').scalar() or 0)
+    return highest + 1
+
+
+def split_read_only(conn, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separate rows for writable months from rows for compacted, read-only ones"""
+    locked = {month for month in {month_of(row['date']) for row in rows} if is_read_only(conn, month)}
+    if not locked:
+        return rows, []
+    return (
+        [row for row in rows if month_of(row['date']) not in locked],
+        [row for row in rows if month_of(row['date']) in locked]
+    )
+
+
+def insert_rows(conn, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> int:
+    """
+    Route rows to their monthly partitions.
+
+    Each partition has its own rowid sequence, so IDs are handed out here,
+    continuing from the highest ID across all months. With ignore_duplicates,
+    rows repeating a transaction_id already in their month are skipped.
+
+    Raises:
+        ValueError: If any row belongs to a read-only month; nothing is
+            written then. Use split_read_only to load the other rows.
+    """
+    _, read_only = split_read_only(conn, rows)
+    if read_only:
+        months = sorted({month_of(row['date']) for row in read_only})
+        raise ValueError(
+            f"{len(read_only)} transactions belong to read-only partitions: "
+            f"{', '.join(partition_name(month) for month in months)}"
+        )
+
+    next_id = _next_id(conn)
+    by_month = defaultdict(list)
+    for row in rows:
+        if row.get('id') is None:
+            row = {**row, 'id': next_id}
+            next_id += 1
+        by_month[month_of(row['date'])].append(row)
+
+    inserted = 0
+    for month, month_rows in sorted(by_month.items()):
+        statement = ensure_partition(conn, month).insert()
+        if ignore_duplicates:
+            statement = statement.prefix_with('OR IGNORE')
+        result = conn.execute(statement, month_rows)
+        inserted += result.rowcount
+    return inserted
+
+
+def transactions_source(conn, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """
+    The table to select transactions from for a date range.
+
+    Unpartitioned, this is just the transactions table. Partitioned, it is
+    a UNION ALL of only the months that overlap the range, so the other
+    months are never opened. Either way it has the same ``.c`` columns.
+
+    A database created without the flag keeps its single table until
+    create_tables splits it, so that table is read until then.
+    """
+    if not PARTITION_BY_MONTH or not is_partitioned(conn):
+        return Transaction.__table__
+
+    months = [
+        month for month in list_partitions(conn)
+        if (not start_date or month >= month_of(start_date)) and (not end_date or month <= month_of(end_date))
+    ]
+    return _union_of(months).subquery(f'{VIEW_NAME}_in_range')
+
+
+def drop_partitions(conn) -> None:
+    """Drop the transactions view and every monthly partition"""
+    drop_view(conn)
+    for month in list_partitions(conn):
+        conn.exec_driver_sql(f'DROP TABLE {partition_name(month)}')
+
+
+def replace_from(conn, staging: Table) -> None:
+    """Replace all partitions with the contents of a loaded staging table"""
+    drop_partitions(conn)
+    months = conn.execute(
+        select(func.strftime('%Y-%m', staging.c.date)).distinct()
+    ).scalars().all()
+    for month in months:
+        partition = ensure_partition(conn, month)
+        conn.execute(partition.insert().from_select(
+            [column.name for column in staging.columns],
+            select(staging).where(func.strftime('%Y-%m', staging.c.date) == month)
+        ))
+    rebuild_view(conn)
+    conn.exec_driver_sql(f'DROP TABLE {staging.name}')
+
+
+def is_read_only(conn, month: str) -> bool:
+    trigger = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+        (f'{partition_name(month)}_read_only_insert',)
+    ).first()
+    return trigger is not None
+
+
+def add_read_only_triggers(conn, name: str) -> None:
+    """Make any insert, update or delete on a partition table fail"""
+    for action in ('insert', 'update', 'delete'):
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER {name}_read_only_{action} BEFORE {action.upper()} ON {name} "
+            f"BEGIN SELECT RAISE(ABORT, '{name} is read-only'); END"
+        )
+
+
+def compact_partition(conn, month: str) -> None:
+    """
+    Rewrite a month in date order and lock it against further writes.
+
+    The rebuilt table stores rows contiguously by date, so range scans on
+    old months read fewer pages, and the triggers turn any later insert,
+    update or delete into an error.
+    """
+    name = partition_name(month)
+    compacted = copy_transactions_table(f'{name}_compacted')
+    conn.execute(CreateTable(compacted))
+    conn.exec_driver_sql(f'INSERT INTO {compacted.name} SELECT * FROM {name} ORDER BY date, id')
+    # SQLite refuses to rename while a view points at a missing table
+    drop_view(conn)
+    conn.exec_driver_sql(f'DROP TABLE {name}')
+    conn.exec_driver_sql(f'ALTER TABLE {compacted.name} RENAME TO {name}')
+    for index in copy_transactions_table(name).indexes:
+        conn.execute(CreateIndex(index))
+
+    add_read_only_triggers(conn, name)
+    conn.exec_driver_sql(f'ANALYZE {name}')
+    rebuild_view(conn)
+    logging.info(f"Compacted partition {name}")
+
+
+def compact_old_partitions(conn, keep_months: int = 2) -> List[str]:
+    """Compact every writable month except the newest ``keep_months``"""
+    months = list_partitions(conn)
+    old_months = months[:-keep_months] if keep_months else months
+    compacted = []
+    for month in old_months:
+        if not is_read_only(conn, month):
+            compact_partition(conn, month)
+            compacted.append(month)
+    return compacted
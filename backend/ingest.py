@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Table
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import Transaction, TransactionType, engine, partitions
+from database.init_db import init_db, seed_transaction_types, build_transaction_row, attach_counterparty_ids
+from database.models.base import SessionLocal
+from process_sms import SMSProcessor
+
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+INGEST_BATCH_SIZE = 5000
+
+# POST /api/ingest only loads server-side files from inside this directory
+INGEST_DIR = os.path.realpath(os.getenv('INGEST_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')))
+
+# SQLite allows a single writer; parsing runs in parallel across jobs but
+# every write (staging batches and the final swap) is serialized here.
+_write_lock = threading.Lock()
+_jobs: Dict[str, 'IngestJob'] = {}
+_jobs_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class IngestJob:
+    """Progress of one background load of an XML export"""
+
+    def __init__(self, xml_path: str, source: Optional[str] = None, remove_when_done: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.xml_path = xml_path
+        self.source = source or os.path.basename(xml_path)
+        self.remove_when_done = remove_when_done
+        self.status = 'queued'
+        self.processed = 0
+        self.loaded = 0
+        self.skipped = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def messages_per_second(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'source': self.source,
+            'processed': self.processed,
+            'loaded': self.loaded,
+            'skipped': self.skipped,
+            'messages_per_second': round(self.messages_per_second(), 1),
+            'created_at': self.created_at.isoformat(timespec='seconds'),
+            'error': self.error
+        }
+
+
+def _staging_table(job: IngestJob) -> Table:
+    """A copy of the transactions table private to one job; indexes are built after the swap"""
+    return partitions.copy_transactions_table(f'transactions_staging_{job.id}')
+
+
+def _write_batch(staging: Table, batch: List[Dict[str, Any]], counterparty_ids: Dict[str, int]) -> int:
+    """Insert one batch of parsed rows into the staging table"""
+    with _write_lock:
+        db = SessionLocal()
+        try:
+            attach_counterparty_ids(db, batch, counterparty_ids)
+
+            # Repeated SMS exports carry the same transaction_id; keep the first
+            result = db.execute(staging.insert().prefix_with('OR IGNORE'), batch)
+            db.commit()
+            return result.rowcount
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def _swap_in(staging: Table) -> None:
+    """
+    Replace the live transactions table with a loaded staging table.
+
+    Runs as one transaction: readers on other connections keep seeing the
+    old table (WAL snapshot) until the commit, then see the new one.
+    With monthly partitioning the staging rows are split into new
+    partitions inside that same transaction.
+    """
+    live = Transaction.__table__
+    with _write_lock, engine.begin() as conn:
+        if partitions.PARTITION_BY_MONTH:
+            partitions.replace_from(conn, staging)
+            return
+
+        conn.exec_driver_sql(f'DROP TABLE IF EXISTS {live.name}')
+        conn.exec_driver_sql(f'ALTER TABLE {staging.name} RENAME TO {live.name}')
+        for index in live.indexes:
+            conn.execute(CreateIndex(index))
+
+
+def run_ingest(job: IngestJob) -> None:
+    """Stream, parse and bulk-load an XML export, then swap it in"""
+    processor = SMSProcessor()
+    staging = _staging_table(job)
+    job.status = 'running'
+    job.started_at = time.monotonic()
+
+    try:
+        init_db()
+        db = SessionLocal()
+        try:
+            seed_transaction_types(db)
+            type_mapping = {t.name: t.id for t in db.query(TransactionType).all()}
+        finally:
+            db.close()
+
+        with _write_lock, engine.begin() as conn:
+            conn.execute(CreateTable(staging))
+
+        counterparty_ids: Dict[str, int] = {}
+        batch: List[Dict[str, Any]] = []
+        for sms in processor.iter_sms_elements(job.xml_path):
+            job.processed += 1
+            try:
+                tx_data = processor.parse_sms_element(sms)
+                if tx_data['status'] in ('Unprocessed', 'Error'):
+                    job.skipped += 1
+                    continue
+                batch.append(build_transaction_row(tx_data, type_mapping))
+            except ValueError as e:
+                logging.error(f"Error processing SMS element: {str(e)}")
+                job.skipped += 1
+                continue
+
+            if len(batch) >= INGEST_BATCH_SIZE:
+                job.loaded += _write_batch(staging, batch, counterparty_ids)
+                batch = []
+
+        if batch:
+            job.loaded += _write_batch(staging, batch, counterparty_ids)
+
+        _swap_in(staging)
+        job.status = 'completed'
+        logging.info(f"Ingest job {job.id} loaded {job.loaded} of {job.processed} messages")
+
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        logging.error(f"Ingest job {job.id} failed: {str(e)}")
+        with _write_lock, engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {staging.name}')
+
+    finally:
+        job.finished_at = time.monotonic()
+        if job.remove_when_done and os.path.exists(job.xml_path):
+            os.remove(job.xml_path)
+
+
+def resolve_ingest_path(path: Any) -> Optional[str]:
+    """The real path of an existing file inside INGEST_DIR, or None if it is anywhere else or not a valid path"""
+    # The path comes straight from the request body, which may hold any JSON value
+    if not isinstance(path, str):
+        return None
+    try:
+        resolved = os.path.realpath(os.path.join(INGEST_DIR, path))
+    except ValueError:
+        # Embedded null bytes
+        return None
+    if os.path.commonpath([resolved, INGEST_DIR]) != INGEST_DIR or not os.path.isfile(resolved):
+        return None
+    return resolved
+
+
+def submit_ingest(xml_path: str, source: Optional[str] = None, remove_when_done: bool = False) -> IngestJob:
+    """Queue an XML export for loading on the background worker pool"""
+    global _executor
+    job = IngestJob(xml_path, source, remove_when_done)
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='ingest')
+        _jobs[job.id] = job
+    _executor.submit(run_ingest, job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    """Look up a queued, running or finished ingest job"""
+    return _jobs.get(job_id)
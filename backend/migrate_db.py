@@ -0,0 +1,26 @@
+import logging
+
+from database import engine
+from database.init_db import create_tables
+from database.migrations import fractional_money_tables
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        with engine.connect() as conn:
+            converted = fractional_money_tables(conn)
+        # Runs every upgrade in order: counterparty columns first, then integer amounts
+        create_tables(engine)
+        print(f"Converted {len(converted)} tables to integer RWF: {', '.join(converted) or 'none'}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        logging.error(f"Database migration error: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
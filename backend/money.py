@@ -0,0 +1,41 @@
+"""
+Money amounts as integer minor units.
+
+The Rwandan franc has no subunit in use (ISO 4217 exponent 0), so its
+minor unit is the franc itself: 2,500 RWF is stored and summed as the
+integer 2500. Values are parsed with Decimal, so "2,500" or "2500.0"
+never pass through a float on their way in.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Union
+
+CURRENCY = 'RWF'
+
+
+def to_rwf(value: Union[str, int, float, Decimal]) -> int:
+    """
+    Convert an amount from an SMS or a processed JSON file to whole francs.
+
+    Args:
+        value: Text such as "1,500" or "1500.00", or a number
+
+    Returns:
+        int: The amount in francs, rounded half up
+
+    Raises:
+        ValueError: If the value is not a number
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    try:
+        amount = Decimal(value.replace(',', '') if isinstance(value, str) else str(value))
+        return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(f"Invalid {CURRENCY} amount: {value!r}")
+
+
+def average_rwf(total: int, count: int) -> int:
+    """Mean of an exact integer total, rounded half up to whole francs (0 when count is 0)"""
+    if not count:
+        return 0
+    return int((Decimal(total) / count).quantize(Decimal(1), rounding=ROUND_HALF_UP))
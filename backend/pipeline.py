@@ -0,0 +1,276 @@
+"""
+Load many SMS exports into the database concurrently.
+
+    reader threads  ->  process pool  ->  single writer
+    (stream XML)        (classify)        (bulk insert)
+
+Readers take files from a shared list and stream their <sms> elements in
+chunks, the process pool runs the regex classification and validation on
+every CPU, and one writer resolves counterparties and inserts the rows,
+since SQLite allows a single writer at a time. Readers hand chunks to the
+writer through a bounded queue of pending pool results, so a reader that
+gets ahead simply waits and memory stays capped however many files there are.
+"""
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import TransactionType
+from database.init_db import (
+    init_db, seed_transaction_types, build_transaction_row, attach_counterparty_ids, insert_transaction_rows,
+    split_read_only_rows, remove_stored_rows
+)
+from database.models.base import SessionLocal
+from process_sms import SMSProcessor
+
+PIPELINE_READERS = int(os.getenv('PIPELINE_READERS', '4'))
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', str(os.cpu_count() or 1)))
+CHUNK_SIZE = 1000
+COMMIT_EVERY = 5000
+PROGRESS_INTERVAL = 5.0
+
+# Only these attributes are sent to the workers
+SMS_ATTRIBUTES = ('body', 'date', 'type')
+
+# Set in each worker process by _init_worker
+_processor: Optional[SMSProcessor] = None
+_type_mapping: Dict[str, int] = {}
+
+
+class FileProgress:
+    """Progress of one export through the pipeline"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.processed = 0
+        self.loaded = 0
+        self.skipped = 0
+        self.read_only = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def duplicates(self) -> int:
+        """Valid messages that were already in the database"""
+        return self.processed - self.loaded - self.skipped - self.read_only
+
+    def messages_per_second(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'file': self.path,
+            'processed': self.processed,
+            'loaded': self.loaded,
+            'skipped': self.skipped,
+            'read_only': self.read_only,
+            'duplicates': self.duplicates,
+            'messages_per_second': round(self.messages_per_second(), 1),
+            'error': self.error
+        }
+
+
+def find_exports(source: str) -> List[str]:
+    """The XML exports in a directory, or the files matching a glob pattern"""
+    if os.path.isdir(source):
+        source = os.path.join(source, '*.xml')
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+def _init_worker(type_mapping: Dict[str, int]) -> None:
+    global _processor, _type_mapping
+    _processor = SMSProcessor()
+    _type_mapping = type_mapping
+
+
+def classify_chunk(messages: List[Dict[str, str]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Parse and validate a chunk of messages in a worker; returns the rows and the number skipped"""
+    rows = []
+    skipped = 0
+    for attributes in messages:
+        try:
+            tx_data = _processor.parse_sms_attributes(attributes)
+            if tx_data['status'] in ('Unprocessed', 'Error'):
+                skipped += 1
+                continue
+            rows.append(build_transaction_row(tx_data, _type_mapping))
+        except (ValueError, TypeError) as e:
+            logging.error(f"Error processing SMS element: {str(e)}")
+            skipped += 1
+    return rows, skipped
+
+
+def _put(results: queue.Queue, item: Any, stop: threading.Event) -> None:
+    """Block until the writer has room, unless the pipeline is shutting down"""
+    while not stop.is_set():
+        try:
+            results.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _read_files(files: queue.Queue, results: queue.Queue, pool: ProcessPoolExecutor, stop: threading.Event) -> None:
+    """Reader thread: stream files into chunks for the pool until none are left"""
+    processor = SMSProcessor()
+    while not stop.is_set():
+        try:
+            progress = files.get_nowait()
+        except queue.Empty:
+            break
+
+        progress.started_at = time.monotonic()
+        chunk: List[Dict[str, str]] = []
+        try:
+            for sms in processor.iter_sms_elements(progress.path):
+                # The writer has failed: stop reading rather than feed the pool unbounded work
+                if stop.is_set():
+                    return
+                chunk.append({key: sms.get(key) for key in SMS_ATTRIBUTES})
+                progress.processed += 1
+                if len(chunk) >= CHUNK_SIZE:
+                    _put(results, (progress, pool.submit(classify_chunk, chunk)), stop)
+                    chunk = []
+        except Exception as e:
+            # Keep what was read before a malformed part of the file
+            progress.error = str(e)
+            logging.error(f"Error reading {progress.path}: {str(e)}")
+        if chunk and not stop.is_set():
+            _put(results, (progress, pool.submit(classify_chunk, chunk)), stop)
+
+        # Everything from this file is queued ahead of this marker
+        _put(results, (progress, None), stop)
+
+    _put(results, (None, None), stop)
+
+
+def _log_file(progress: FileProgress) -> None:
+    status = f"failed ({progress.error})" if progress.error else "done"
+    logging.info(
+        f"{os.path.basename(progress.path)} {status}: {progress.processed} messages, "
+        f"{progress.loaded} loaded, {progress.skipped} skipped, {progress.read_only} in read-only months, "
+        f"{progress.duplicates} duplicates, "
+        f"{progress.messages_per_second():.0f} messages/s"
+    )
+
+
+def _write_results(results: queue.Queue, readers: int, all_files: List[FileProgress], started_at: float) -> None:
+    """The single writer: insert each classified chunk as it completes, in queue order"""
+    db = SessionLocal()
+    counterparty_ids: Dict[str, int] = {}
+    uncommitted = 0
+    finished_readers = 0
+    next_report = time.monotonic() + PROGRESS_INTERVAL
+    try:
+        while finished_readers < readers:
+            progress, future = results.get()
+            if progress is None:
+                finished_readers += 1
+                continue
+
+            if future is None:
+                db.commit()
+                uncommitted = 0
+                progress.finished_at = time.monotonic()
+                _log_file(progress)
+                continue
+
+            rows, skipped = future.result()
+            progress.skipped += skipped
+            # Compacted months are locked; their rows are counted rather than failing the run
+            rows, read_only = split_read_only_rows(db, rows)
+            progress.read_only += len(read_only)
+            # Whatever is removed here is counted as a duplicate
+            rows = remove_stored_rows(db, rows)
+            if rows:
+                attach_counterparty_ids(db, rows, counterparty_ids)
+                progress.loaded += insert_transaction_rows(db, rows, ignore_duplicates=True)
+                uncommitted += len(rows)
+            if uncommitted >= COMMIT_EVERY:
+                db.commit()
+                uncommitted = 0
+
+            if time.monotonic() >= next_report:
+                processed = sum(p.processed for p in all_files)
+                done = sum(1 for p in all_files if p.finished_at is not None)
+                rate = processed / (time.monotonic() - started_at)
+                logging.info(f"Progress: {done}/{len(all_files)} files, {processed} messages, {rate:.0f} messages/s")
+                next_report = time.monotonic() + PROGRESS_INTERVAL
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_pipeline(paths: List[str], readers: int = PIPELINE_READERS, workers: int = PIPELINE_WORKERS) -> Dict[str, Any]:
+    """
+    Load a set of XML exports into the database, appending to what is there.
+
+    Messages already stored (the same date and body, or the same
+    transaction_id) are counted as duplicates and skipped, so overlapping
+    exports can be loaded safely.
+
+    Returns:
+        Dict[str, Any]: Overall totals and throughput, plus a summary per file
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_transaction_types(db)
+        type_mapping = {t.name: t.id for t in db.query(TransactionType).all()}
+    finally:
+        db.close()
+
+    all_files = [FileProgress(path) for path in paths]
+    files: queue.Queue = queue.Queue()
+    for progress in all_files:
+        files.put(progress)
+
+    readers = max(1, min(readers, len(all_files)))
+    # Room for two chunks per worker: enough to keep the pool busy while
+    # the writer catches up, and the cap on how far readers can get ahead
+    results: queue.Queue = queue.Queue(maxsize=2 * workers)
+    stop = threading.Event()
+    started_at = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(type_mapping,)) as pool:
+        threads = [
+            threading.Thread(target=_read_files, args=(files, results, pool, stop), name=f'pipeline-reader-{i}', daemon=True)
+            for i in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            _write_results(results, readers, all_files, started_at)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    elapsed = time.monotonic() - started_at
+    processed = sum(p.processed for p in all_files)
+    totals = {
+        'files': len(all_files),
+        'failed_files': sum(1 for p in all_files if p.error),
+        'processed': processed,
+        'loaded': sum(p.loaded for p in all_files),
+        'skipped': sum(p.skipped for p in all_files),
+        'read_only': sum(p.read_only for p in all_files),
+        'duplicates': sum(p.duplicates for p in all_files),
+        'elapsed_seconds': round(elapsed, 2),
+        'messages_per_second': round(processed / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    logging.info(f"Pipeline complete. Stats: {totals}")
+    return {**totals, 'per_file': [p.to_dict() for p in all_files]}
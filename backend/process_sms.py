@@ -1,19 +1,12 @@
+import argparse
 import xml.etree.ElementTree as ET
 import re
 import json
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Union, IO
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('sms_processing.log'),
-        logging.StreamHandler()
-    ]
-)
+from money import to_rwf
 
 class SMSProcessor:
     def __init__(self):
@@ -54,7 +47,8 @@ class SMSProcessor:
             sms_body (str): The raw SMS message body
             
         Returns:
-            Dict[str, Any]: Dictionary containing extracted transaction details
+            Dict[str, Any]: Dictionary containing extracted transaction details,
+            with amount, fee and balance as whole RWF integers
         """
         transaction_data = {
             "type": "Unknown",
@@ -69,17 +63,20 @@ class SMSProcessor:
 
         try:
             # Extract balance and transaction ID (common patterns)
-            balance_match = re.search(r"balance is (\d+,?\d*\.?\d*) RWF", sms_body)
+            balance_match = re.search(r"balance(?: is|\s*:)\s*(\d+,?\d*\.?\d*) RWF", sms_body, re.IGNORECASE)
             if balance_match:
-                transaction_data["balance"] = float(balance_match.group(1).replace(",", ""))
+                transaction_data["balance"] = to_rwf(balance_match.group(1))
 
-            fee_match = re.search(r"Fee: (\d+,?\d*\.?\d*) RWF", sms_body)
+            fee_match = re.search(r"Fee(?: was| paid)?:? (\d+,?\d*\.?\d*) RWF", sms_body)
             if fee_match:
-                transaction_data["fee"] = float(fee_match.group(1).replace(",", ""))
+                transaction_data["fee"] = to_rwf(fee_match.group(1))
             else:
-                transaction_data["fee"] = 0.0
+                transaction_data["fee"] = 0
 
-            id_match = re.search(r"Ref: (\w+)|ID: (\w+)|TrxID: (\w+)|TransID: (\w+)", sms_body)
+            # MTN exports use "TxId: 123" and "(Financial) Transaction Id: 123"
+            id_match = re.search(
+                r"Ref: (\w+)|ID: (\w+)|TrxID: (\w+)|TransID: (\w+)|TxId:\s*(\w+)|Transaction Id: (\w+)", sms_body
+            )
             if id_match:
                 transaction_data["transaction_id"] = next(filter(None, id_match.groups()), None)
 
@@ -89,8 +86,7 @@ class SMSProcessor:
                     match = pattern.search(sms_body)
                     if match:
                         transaction_data["type"] = sms_type
-                        amount_str = match.group(1).replace(",", "")
-                        transaction_data["amount"] = float(amount_str)
+                        transaction_data["amount"] = to_rwf(match.group(1))
                         
                         # Determine sender/receiver based on type
                         if sms_type in ["Incoming Money", "Bank Deposits"]:
@@ -108,7 +104,7 @@ class SMSProcessor:
             if transaction_data["type"] == "Unknown":
                 amount_match = re.search(r"(\d+,?\d*\.?\d*) RWF", sms_body)
                 if amount_match:
-                    transaction_data["amount"] = float(amount_match.group(1).replace(",", ""))
+                    transaction_data["amount"] = to_rwf(amount_match.group(1))
                     transaction_data["status"] = "Partially Processed"
                 else:
                     transaction_data["status"] = "Unprocessed"
@@ -120,6 +116,62 @@ class SMSProcessor:
 
         return transaction_data
 
+    def iter_sms_elements(self, xml_source: Union[str, IO[bytes]]) -> Iterator[ET.Element]:
+        """
+        Stream <sms> elements from an XML export without building the whole tree.
+
+        Each element is cleared once the caller moves on, so memory stays flat
+        no matter how large the export is.
+
+        Args:
+            xml_source (Union[str, IO[bytes]]): Path or binary file object of the XML export
+
+        Yields:
+            ET.Element: One <sms> element at a time
+        """
+        context = ET.iterparse(xml_source, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "end" and elem.tag == "sms":
+                yield elem
+                root.clear()
+
+    def parse_sms_element(self, sms: ET.Element) -> Dict[str, Any]:
+        """
+        Turn a single <sms> element into a transaction dictionary.
+
+        Args:
+            sms (ET.Element): The <sms> element from the export
+
+        Returns:
+            Dict[str, Any]: Original SMS attributes merged with the parsed details
+        """
+        return self.parse_sms_attributes(sms.attrib)
+
+    def parse_sms_attributes(self, attributes: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Turn the attributes of an <sms> element into a transaction dictionary.
+
+        Plain dictionaries can be sent to worker processes, unlike elements.
+
+        Args:
+            attributes (Dict[str, str]): At least the body, date and type attributes
+
+        Returns:
+            Dict[str, Any]: Original SMS attributes merged with the parsed details
+        """
+        sms_body = attributes.get("body")
+        sms_date_ms = int(attributes.get("date"))
+        sms_date = datetime.fromtimestamp(sms_date_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+        # Add original SMS attributes and clean up
+        return {
+            "raw_body": sms_body,
+            "date": sms_date,
+            "original_type": attributes.get("type"),
+            **self.parse_sms_body(sms_body)
+        }
+
     def process_xml_data(self, xml_file_path: str, output_json_path: str, unprocessed_log_path: str) -> Dict[str, int]:
         """
         Process XML file containing SMS messages and extract transaction data.
@@ -133,33 +185,18 @@ class SMSProcessor:
             Dict[str, int]: Statistics about the processing results
         """
         try:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-
             processed_sms_data = []
             unprocessed_messages = []
             error_messages = []
 
-            for sms in root.findall("sms"):
+            for sms in self.iter_sms_elements(xml_file_path):
+                sms_body = sms.get("body")
                 try:
-                    sms_body = sms.get("body")
-                    sms_date_ms = int(sms.get("date"))
-                    sms_date = datetime.fromtimestamp(sms_date_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
-                    sms_type_raw = sms.get("type")
-
-                    parsed_data = self.parse_sms_body(sms_body)
-                    
-                    # Add original SMS attributes and clean up
-                    transaction = {
-                        "raw_body": sms_body,
-                        "date": sms_date,
-                        "original_type": sms_type_raw,
-                        **parsed_data
-                    }
+                    transaction = self.parse_sms_element(sms)
 
-                    if parsed_data["status"] == "Unprocessed":
+                    if transaction["status"] == "Unprocessed":
                         unprocessed_messages.append(transaction)
-                    elif parsed_data["status"] == "Error":
+                    elif transaction["status"] == "Error":
                         error_messages.append(transaction)
                     else:
                         processed_sms_data.append(transaction)
@@ -195,7 +232,58 @@ class SMSProcessor:
             logging.error(f"Error processing XML file: {str(e)}")
             raise
 
+def configure_logging():
+    """Log to the console and to sms_processing.log when run as a script"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('sms_processing.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+def run_pipeline_mode(source: str, readers: Optional[int], workers: Optional[int]):
+    """Load every export matching a directory or glob straight into the database"""
+    # Imported here so the single-file mode does not need the database package
+    from pipeline import find_exports, run_pipeline
+
+    paths = find_exports(source)
+    if not paths:
+        print(f"No XML exports found for: {source}")
+        return
+
+    options = {key: value for key, value in (('readers', readers), ('workers', workers)) if value}
+    stats = run_pipeline(paths, **options)
+    print("\nPipeline Summary:")
+    for file_stats in stats['per_file']:
+        status = f" (failed: {file_stats['error']})" if file_stats['error'] else ""
+        print(f"{file_stats['file']}: {file_stats['loaded']} loaded, {file_stats['skipped']} skipped, "
+              f"{file_stats['read_only']} in read-only months, {file_stats['duplicates']} duplicates, "
+              f"{file_stats['messages_per_second']} messages/s{status}")
+    print(f"\nFiles: {stats['files']} ({stats['failed_files']} failed)")
+    print(f"Messages: {stats['processed']} in {stats['elapsed_seconds']} s ({stats['messages_per_second']} messages/s)")
+    print(f"Loaded: {stats['loaded']}, skipped: {stats['skipped']}, "
+          f"in read-only months: {stats['read_only']}, duplicates: {stats['duplicates']}")
+
 def main():
+    parser = argparse.ArgumentParser(description="Parse MTN MoMo SMS exports")
+    parser.add_argument('source', nargs='?',
+                        help="Directory or glob of XML exports to load into the database concurrently; "
+                             "without it, data/modified_sms_v2.xml is parsed to JSON")
+    parser.add_argument('--readers', type=int, help="Reader threads for pipeline mode")
+    parser.add_argument('--workers', type=int, help="Parser processes for pipeline mode")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.source:
+        try:
+            run_pipeline_mode(args.source, args.readers, args.workers)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            logging.error(f"Pipeline error: {str(e)}")
+        return
+
     processor = SMSProcessor()
     xml_file = "data/modified_sms_v2.xml"
     output_json = "data/processed_sms_data.json"
@@ -0,0 +1,179 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from database import Transaction, TransactionType
+from database.models.base import SessionLocal
+
+# Transaction types that add money to the account; every other known type
+# takes the amount (plus fee) out of it.
+CREDIT_TYPES = ["Incoming Money", "Bank Deposits"]
+DEBIT_TYPES = [
+    "Payments to Code Holders",
+    "Transfers to Mobile Numbers",
+    "Airtime Bill Payments",
+    "Transactions Initiated by Third Parties",
+    "Withdrawals from Agents"
+]
+
+# Amounts are whole RWF, so balances must match exactly
+DEFAULT_TOLERANCE = 0
+
+
+def _balance_checks_query(db: Session, type_ids: Dict[str, int], tolerance: int):
+    """
+    Build the query that checks every balance against the previous one.
+
+    All of the work happens inside the database in a single ordered scan of
+    the date index: a LAG window function pairs each row with the previous
+    balance, and the expected credit/debit balances are computed as column
+    expressions, so no row is materialised in Python unless it is a gap.
+    """
+    credit_ids = [type_ids[name] for name in CREDIT_TYPES if name in type_ids]
+    debit_ids = [type_ids[name] for name in DEBIT_TYPES if name in type_ids]
+
+    order = (Transaction.date, Transaction.id)
+
+    # Only messages that reported a balance take part in the chain
+    chained = db.query(
+        Transaction.id.label('id'),
+        Transaction.transaction_id.label('transaction_id'),
+        Transaction.type_id.label('type_id'),
+        Transaction.date.label('date'),
+        Transaction.amount.label('amount'),
+        func.coalesce(Transaction.fee, 0).label('fee'),
+        Transaction.balance.label('balance'),
+        case(
+            (Transaction.type_id.in_(credit_ids), 1),
+            (Transaction.type_id.in_(debit_ids), -1),
+            else_=0
+        ).label('direction'),
+        func.lag(Transaction.id, type_=Transaction.id.type).over(order_by=order).label('previous_id'),
+        func.lag(Transaction.balance, type_=Transaction.balance.type).over(order_by=order).label('previous_balance')
+    ).filter(
+        Transaction.balance.isnot(None)
+    ).subquery()
+
+    credit_expected = chained.c.previous_balance + chained.c.amount
+    debit_expected = chained.c.previous_balance - chained.c.amount - chained.c.fee
+    credit_off = func.abs(chained.c.balance - credit_expected) > tolerance
+    debit_off = func.abs(chained.c.balance - debit_expected) > tolerance
+
+    # Unclassified messages pass if either direction explains the new balance
+    expected = case(
+        (chained.c.direction == 1, credit_expected),
+        (chained.c.direction == -1, debit_expected),
+        (
+            func.abs(chained.c.balance - credit_expected) <= func.abs(chained.c.balance - debit_expected),
+            credit_expected
+        ),
+        else_=debit_expected
+    )
+
+    is_gap = and_(
+        chained.c.previous_balance.isnot(None),
+        or_(
+            and_(chained.c.direction == 1, credit_off),
+            and_(chained.c.direction == -1, debit_off),
+            and_(chained.c.direction == 0, credit_off, debit_off)
+        )
+    )
+
+    return db.query(
+        chained.c.id,
+        chained.c.transaction_id,
+        chained.c.type_id,
+        chained.c.date,
+        chained.c.previous_id,
+        chained.c.previous_balance,
+        chained.c.amount,
+        chained.c.fee,
+        expected.label('expected_balance'),
+        chained.c.balance
+    ).filter(is_gap)
+
+
+def reconcile_balances(db: Session, tolerance: int = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+    """
+    Check that every reported balance follows from the previous one.
+
+    For each message with a balance, the previous balance plus the amount
+    (credits) or minus the amount and fee (debits) must equal the new
+    balance. Rows where it does not point at a missing or out-of-order SMS.
+
+    Args:
+        db (Session): Database session
+        tolerance (int): Largest difference in RWF still treated as a match
+
+    Returns:
+        Dict[str, Any]: Report with the number of checked pairs and the gaps found
+    """
+    type_ids = {t.name: t.id for t in db.query(TransactionType).all()}
+    type_names = {type_id: name for name, type_id in type_ids.items()}
+
+    gaps: List[Dict[str, Any]] = []
+    for row in _balance_checks_query(db, type_ids, tolerance):
+        gaps.append({
+            'id': row.id,
+            'transaction_id': row.transaction_id,
+            'type_name': type_names.get(row.type_id),
+            'date': row.date.isoformat(),
+            'previous_id': row.previous_id,
+            'previous_balance': row.previous_balance,
+            'amount': row.amount,
+            'fee': row.fee,
+            'expected_balance': row.expected_balance,
+            'balance': row.balance,
+            'discrepancy': row.balance - row.expected_balance
+        })
+    gaps.sort(key=lambda gap: (gap['date'], gap['id']))
+
+    # Every balance except the first one is compared with its predecessor
+    balances = db.query(func.count(Transaction.id)).filter(Transaction.balance.isnot(None)).scalar()
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'tolerance': tolerance,
+        'checked': max(balances - 1, 0),
+        'gap_count': len(gaps),
+        'gaps': gaps
+    }
+    logging.info(f"Reconciliation complete. Checked {report['checked']} balances, found {report['gap_count']} gaps")
+    return report
+
+
+def write_reconciliation_report(report: Dict[str, Any], output_json_path: str) -> None:
+    """Save a reconciliation report as JSON"""
+    with open(output_json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+
+def main():
+    output_json = "data/reconciliation_report.json"
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    db = SessionLocal()
+    try:
+        report = reconcile_balances(db)
+        write_reconciliation_report(report, output_json)
+        print("\nReconciliation Summary:")
+        print(f"Balances checked: {report['checked']}")
+        print(f"Gaps found: {report['gap_count']}")
+        print(f"\nReport saved to: {output_json}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        logging.error(f"Reconciliation error: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
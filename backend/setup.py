@@ -9,6 +9,7 @@ setup(
         "Flask-CORS==4.0.0",
         "python-dotenv==1.0.0",
         "SQLAlchemy==1.4.54",
+        "orjson==3.9.10",
         "Werkzeug==3.0.1",
         "pytest==7.4.3",
         "black==23.11.0",
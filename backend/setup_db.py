@@ -2,7 +2,8 @@ import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database.models import Base, TransactionType
-from database.init_db import seed_transaction_types, load_transactions
+from database import partitions
+from database.init_db import create_tables, seed_transaction_types, load_transactions
 
 # Configure logging
 logging.basicConfig(
@@ -19,8 +20,10 @@ def setup_database():
 
     try:
         # Drop all tables and recreate them
+        with engine.begin() as conn:
+            partitions.drop_partitions(conn)
         Base.metadata.drop_all(engine)
-        Base.metadata.create_all(engine)
+        create_tables(engine)
         logging.info("Database tables recreated successfully")
 
         # Seed transaction types
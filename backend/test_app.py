@@ -0,0 +1,156 @@
+import unittest
+from datetime import datetime
+from database import partitions
+from test_support import ApiTestCase, make_row
+
+# Around the end of May; unpadded dates are as valid a filter as padded ones
+MONTH_BOUNDARY_ROWS = [
+    make_row(datetime(2024, 5, 31, 12, 0), 100),
+    make_row(datetime(2024, 6, 1, 9, 0), 200),
+    make_row(datetime(2024, 6, 1, 18, 0), 400),
+    make_row(datetime(2024, 7, 1, 8, 0), 800),
+]
+
+class TestTransactionsDateRange(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_rows(MONTH_BOUNDARY_ROWS)
+
+    def amounts(self, query):
+        response = self.client.get(f'/api/transactions?fields=amount&{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['amount'] for row in response.get_json())
+
+    def test_date_range(self):
+        """Test that padded and unpadded dates select the same rows"""
+        self.assertEqual(self.amounts('start_date=2024-06-01&end_date=2024-06-02'), [200, 400])
+        self.assertEqual(self.amounts('start_date=2024-6-1&end_date=2024-6-2'), [200, 400])
+        self.assertEqual(self.amounts('end_date=2024-6-1'), [100])
+        self.assertEqual(self.amounts('start_date=2024-6-2'), [800])
+
+    def test_invalid_date_is_rejected(self):
+        response = self.client.get('/api/transactions?start_date=June')
+        self.assertEqual(response.status_code, 400)
+
+class TestPartitionedTransactionsDateRange(TestTransactionsDateRange):
+    PARTITION_BY_MONTH = True
+
+class TestTransactionFields(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_rows([make_row(datetime(2024, 5, 10, 16, 30, 51), 2000, transaction_id='76662021700', sender='Jane Smith')])
+
+    def get(self, query=''):
+        return self.client.get(f'/api/transactions?{query}')
+
+    def test_all_fields_by_default(self):
+        """Test the default response: every field, null zero fees and balances, naive ISO 8601 dates"""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [{
+            'id': 1, 'transaction_id': '76662021700', 'type_name': 'Incoming Money',
+            'date': '2024-05-10T16:30:51', 'amount': 2000, 'fee': None, 'balance': None,
+            'sender': 'Jane Smith', 'receiver': None, 'raw_body': 'You have received 2000 RWF', 'status': 'Processed'
+        }])
+
+    def test_projection(self):
+        """Test that fields picks columns in response order and exclude removes them"""
+        transactions = self.get('fields=amount,date,fee').get_json()
+        self.assertEqual(transactions, [{'amount': 2000, 'date': '2024-05-10T16:30:51', 'fee': None}])
+        self.assertEqual(list(transactions[0]), ['amount', 'date', 'fee'])
+
+        transactions = self.get('exclude=raw_body').get_json()
+        self.assertEqual(list(transactions[0]), [
+            'id', 'transaction_id', 'type_name', 'date', 'amount', 'fee', 'balance', 'sender', 'receiver', 'status'
+        ])
+        self.assertEqual(self.get('fields=id,amount&exclude=amount').get_json(), [{'id': 1}])
+
+    def test_invalid_projection_is_rejected(self):
+        for query in ('fields=amount,secret', 'exclude=secret', 'fields=amount&exclude=amount'):
+            with self.subTest(query=query):
+                response = self.get(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.get_json())
+
+class TestTopCounterparties(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Sender names as the parser reads them from the real export, account number included
+        self.add_rows([
+            make_row(datetime(2024, 5, 10), 2000, sender='Jane Smith (*********013)', receiver='You'),
+            make_row(datetime(2024, 5, 20), 500, sender='Jane Smith (*********013)', receiver='You'),
+            make_row(datetime(2024, 6, 1), 10000, sender='Samuel Carter (*********036)', receiver='You'),
+            make_row(datetime(2024, 6, 5), 100, sender='Alex Doe (*********048)', receiver='You'),
+            make_row(datetime(2024, 6, 6), 100, sender='Alex Doe (*********048)', receiver='You'),
+            make_row(datetime(2024, 6, 7), 100, sender='Alex Doe (*********048)', receiver='You'),
+            make_row(datetime(2024, 6, 10), 700, sender='You', receiver='Jane Smith (*********013)', type_id=2),
+        ])
+
+    def top(self, query=''):
+        response = self.client.get(f'/api/counterparties/top?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [(party['name'].split(' (')[0], party['count'], party['total_amount']) for party in response.get_json()]
+
+    def test_ranking(self):
+        """Test ranking senders and receivers by volume and by count"""
+        self.assertEqual(self.top('role=sender'), [('Samuel Carter', 1, 10000), ('Jane Smith', 2, 2500), ('Alex Doe', 3, 300)])
+        self.assertEqual(self.top('role=sender&by=count'), [('Alex Doe', 3, 300), ('Jane Smith', 2, 2500), ('Samuel Carter', 1, 10000)])
+        self.assertEqual(self.top('role=sender&limit=1'), [('Samuel Carter', 1, 10000)])
+        self.assertEqual(self.top(), [('Jane Smith', 1, 700)])
+
+    def test_date_range(self):
+        self.assertEqual(self.top('role=sender&start_date=2024-06-01'), [('Samuel Carter', 1, 10000), ('Alex Doe', 3, 300)])
+        self.assertEqual(self.top('role=sender&end_date=2024-06-01&by=count'), [('Jane Smith', 2, 2500), ('Samuel Carter', 1, 10000)])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ('role=payer', 'by=amount', 'limit=abc', 'limit=0', 'limit=-1', 'limit=2.5', 'start_date=May'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/counterparties/top?{query}').status_code, 400)
+
+class TestIngestRequests(ApiTestCase):
+    def test_invalid_paths_are_rejected(self):
+        """Test that a path that is not a usable string is a 400, not a server error"""
+        for payload in ({'path': 123}, {'path': 'export\x00.xml'}, {'path': '../app.py'}, ['export.xml'], {}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.client.post('/api/ingest', json=payload).status_code, 400)
+
+class TestReconciliationRequests(ApiTestCase):
+    def test_tolerance(self):
+        """Test that the tolerance is a whole, non-negative number of RWF"""
+        for query in ('', '?tolerance=0', '?tolerance=100'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/reconciliation{query}').status_code, 200)
+        for query in ('?tolerance=0.5', '?tolerance=abc', '?tolerance=-1', '?tolerance='):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/reconciliation{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {'error': 'tolerance must be a whole number of RWF'})
+
+class TestUnpartitionedDatabaseWithFlagOn(ApiTestCase):
+    """A database created before PARTITION_BY_MONTH was set, served with the flag on"""
+
+    def setUp(self):
+        super().setUp()
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO counterparties (id, name) VALUES (1, 'Jane Smith')")
+        self.add_rows([
+            make_row(datetime(2024, 5, 31, 12, 0), 100, receiver='Jane Smith', receiver_id=1),
+            make_row(datetime(2024, 6, 1, 9, 0), 200, receiver='Jane Smith', receiver_id=1),
+        ])
+        self.patch('database.partitions.PARTITION_BY_MONTH', True)
+
+    def test_unsplit_table_is_read(self):
+        """Test that the endpoints read the single table until it is split into months"""
+        with self.engine.connect() as conn:
+            self.assertFalse(partitions.is_partitioned(conn))
+
+        transactions = self.client.get('/api/transactions').get_json()
+        self.assertEqual(sorted(t['amount'] for t in transactions), [100, 200])
+        june = self.client.get('/api/transactions?start_date=2024-06-01').get_json()
+        self.assertEqual([t['amount'] for t in june], [200])
+
+        top = self.client.get('/api/counterparties/top').get_json()
+        self.assertEqual(top, [{'id': 1, 'name': 'Jane Smith', 'count': 2, 'total_amount': 300}])
+
+if __name__ == '__main__':
+    unittest.main()
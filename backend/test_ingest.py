@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from database import Transaction, Counterparty
+from test_support import DatabaseTestCase
+import ingest
+
+SMS_EXPORT = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="3">
+  <sms date="1715351458724" type="1" body="You have received 2000 RWF from Jane Smith. Your new balance:2000 RWF." />
+  <sms date="1715351506754" type="1" body="You have received 500 RWF from John Doe. Your new balance:2500 RWF." />
+  <sms date="1715369560245" type="1" body="Welcome to MoMo." />
+</smses>
+"""
+
+class TestIngest(DatabaseTestCase):
+    # Point the worker at a throwaway database instead of the shared engine
+    ENGINE_TARGETS = ('ingest.engine', 'database.init_db.engine')
+    SESSION_TARGETS = ('ingest.SessionLocal',)
+
+    def setUp(self):
+        super().setUp()
+        self.xml_path = self.write_file('export.xml', SMS_EXPORT)
+
+    def test_ingest_replaces_live_data(self):
+        """Test that a job loads into staging and swaps it in as the live table"""
+        for _ in range(2):
+            job = ingest.IngestJob(self.xml_path)
+            ingest.run_ingest(job)
+
+            self.assertEqual(job.status, 'completed', job.error)
+            self.assertEqual(job.processed, 3)
+            self.assertEqual(job.loaded, 2)
+            self.assertEqual(job.skipped, 1)
+
+        # The second run replaced the first instead of appending to it
+        db = self.Session()
+        try:
+            self.assertEqual(db.query(Transaction).count(), 2)
+            self.assertEqual(db.query(Counterparty).count(), 2)
+        finally:
+            db.close()
+
+        with self.engine.connect() as conn:
+            tables = [row[0] for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'transactions_staging%'"
+            )]
+        self.assertEqual(tables, [])
+
+    def test_paths_outside_ingest_dir_are_rejected(self):
+        """Test that only existing files inside INGEST_DIR can be ingested by path"""
+        outside = tempfile.NamedTemporaryFile(suffix='.xml', delete=False)
+        outside.close()
+        self.addCleanup(os.remove, outside.name)
+
+        ingest_dir = os.path.realpath(self.tmp_dir.name)
+        with mock.patch.object(ingest, 'INGEST_DIR', ingest_dir):
+            self.assertEqual(ingest.resolve_ingest_path('export.xml'), os.path.join(ingest_dir, 'export.xml'))
+            self.assertEqual(ingest.resolve_ingest_path(self.xml_path), os.path.join(ingest_dir, 'export.xml'))
+            self.assertIsNone(ingest.resolve_ingest_path(outside.name))
+            self.assertIsNone(ingest.resolve_ingest_path(os.path.join('..', os.path.basename(outside.name))))
+            self.assertIsNone(ingest.resolve_ingest_path('missing.xml'))
+
+            os.symlink(outside.name, os.path.join(ingest_dir, 'link.xml'))
+            self.assertIsNone(ingest.resolve_ingest_path('link.xml'))
+
+            # Whatever JSON value the request carried
+            for invalid in (123, ['export.xml'], 'export\x00.xml'):
+                self.assertIsNone(ingest.resolve_ingest_path(invalid))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, Transaction, Counterparty
+from database.init_db import create_tables, seed_transaction_types, load_transactions
+from test_support import DatabaseTestCase
+
+# Tables as the first release created them, before counterparties and integer amounts
+BASELINE_SCHEMA = [
+    """CREATE TABLE transaction_types (
+        id INTEGER NOT NULL, name VARCHAR(50) NOT NULL, PRIMARY KEY (id), UNIQUE (name))""",
+    """CREATE TABLE transactions (
+        id INTEGER NOT NULL, transaction_id VARCHAR(50), type_id INTEGER NOT NULL, date DATETIME NOT NULL,
+        amount FLOAT NOT NULL, fee FLOAT, balance FLOAT, sender VARCHAR(100), receiver VARCHAR(100),
+        raw_body VARCHAR(500) NOT NULL, status VARCHAR(20) NOT NULL,
+        PRIMARY KEY (id), UNIQUE (transaction_id), FOREIGN KEY(type_id) REFERENCES transaction_types (id))""",
+]
+
+def create_baseline_database(engine, rows):
+    """Build a database the way the first release did and load raw transaction rows into it"""
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("INSERT INTO transaction_types (id, name) VALUES (1, 'Incoming Money'), (2, 'Payments to Code Holders')")
+        for row in rows:
+            conn.exec_driver_sql(
+                "INSERT INTO transactions (transaction_id, type_id, date, amount, fee, balance, sender, receiver, raw_body, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Processed')", row
+            )
+
+class TestLoadTransactions(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        seed_transaction_types(self.db)
+
+        transactions = [
+            {"transaction_id": "1", "type": "Incoming Money", "date": "2024-05-10 16:30:51",
+             "amount": 2000.0, "fee": 0.0, "balance": 2000.0, "sender": "Jane  Smith", "receiver": "You",
+             "raw_body": "You have received 2000 RWF from Jane Smith.", "status": "Processed"},
+            {"transaction_id": "2", "type": "Payments to Code Holders", "date": "2024-05-10 16:31:39",
+             "amount": 500.0, "fee": 0.0, "balance": 1500.0, "sender": "You", "receiver": "Jane Smith",
+             "raw_body": "You paid 500 RWF to Jane Smith.", "status": "Processed"},
+        ]
+        fd, self.json_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(transactions, f)
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.json_path)
+
+    def test_counterparties_are_interned(self):
+        """Test that repeated names share one counterparty and 'You' is not interned"""
+        load_transactions(self.db, self.json_path)
+
+        counterparties = self.db.query(Counterparty).all()
+        self.assertEqual([c.name for c in counterparties], ['Jane Smith'])
+
+        received, paid = self.db.query(Transaction).order_by(Transaction.transaction_id).all()
+        self.assertEqual(received.sender_id, counterparties[0].id)
+        self.assertIsNone(received.receiver_id)
+        self.assertEqual(paid.receiver_id, counterparties[0].id)
+
+        # Loading again reuses the existing rows instead of creating new ones
+        self.db.query(Transaction).delete()
+        self.db.commit()
+        load_transactions(self.db, self.json_path)
+        self.assertEqual(self.db.query(Counterparty).count(), 1)
+
+class TestUpgradeBaselineDatabase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        create_baseline_database(self.engine, [
+            ('1', 1, '2024-05-10 16:30:51.000000', 2000.0, 0.0, 2000.0, 'Jane  Smith', 'You', 'received 2000 RWF'),
+            ('2', 2, '2024-05-10 16:31:39.000000', 500.0, 0.0, 1500.0, 'You', 'Jane Smith', 'paid 500 RWF'),
+            ('3', 2, '2024-05-11 09:00:00.000000', 300.0, 0.0, 1200.0, 'You', 'Samuel Carter', 'paid 300 RWF'),
+        ])
+
+    def test_counterparty_columns_are_added_and_backfilled(self):
+        """Test that create_tables adds sender_id/receiver_id to an old table and interns its names"""
+        create_tables(self.engine)
+        create_tables(self.engine)
+
+        db = self.Session()
+        try:
+            parties = {c.name: c.id for c in db.query(Counterparty)}
+            self.assertEqual(sorted(parties), ['Jane Smith', 'Samuel Carter'])
+            rows = [(t.sender_id, t.receiver_id) for t in db.query(Transaction).order_by(Transaction.id)]
+            self.assertEqual(rows, [
+                (parties['Jane Smith'], None),
+                (None, parties['Jane Smith']),
+                (None, parties['Samuel Carter']),
+            ])
+        finally:
+            db.close()
+
+        with self.engine.connect() as conn:
+            indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(transactions)")}
+        self.assertTrue({'ix_transactions_date', 'ix_transactions_sender_date', 'ix_transactions_receiver_date'} <= indexes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+from sqlalchemy import Float, MetaData, select, func
+from sqlalchemy.exc import DatabaseError
+from database import Transaction, partitions
+from database.init_db import create_tables
+from database.migrations import fractional_money_tables, migrate_money_to_integers
+from money import to_rwf, average_rwf
+from process_sms import SMSProcessor
+from test_init_db import create_baseline_database
+from test_support import DatabaseTestCase
+
+def float_money_table(name):
+    """A monthly partition as it was created before amounts became integers"""
+    table = partitions.copy_transactions_table(name, MetaData())
+    for column in ('amount', 'fee', 'balance'):
+        table.c[column].type = Float()
+    return table
+
+class TestMoneyValues(unittest.TestCase):
+    def test_to_rwf(self):
+        """Test that text and numbers become whole francs without going through float"""
+        self.assertEqual(to_rwf("1,500"), 1500)
+        self.assertEqual(to_rwf("2000.50"), 2001)
+        self.assertEqual(to_rwf(2000.0), 2000)
+        self.assertEqual(to_rwf(750), 750)
+        for invalid in ("RWF", None, ""):
+            with self.assertRaises(ValueError):
+                to_rwf(invalid)
+
+    def test_average_rwf(self):
+        self.assertEqual(average_rwf(1001, 2), 501)
+        self.assertEqual(average_rwf(0, 0), 0)
+
+    def test_parsed_amounts_are_integers(self):
+        """Test that parse_sms_body returns amounts, fees and balances as int"""
+        details = SMSProcessor().parse_sms_body(
+            "You have sent 1,250 RWF to Jane Smith. Your new balance: 12,345 RWF. Fee was 100 RWF."
+        )
+        for field, expected in (('amount', 1250), ('fee', 100), ('balance', 12345)):
+            self.assertEqual(details[field], expected)
+            self.assertIs(type(details[field]), int)
+
+class TestMoneyMigration(DatabaseTestCase):
+    def insert_float_rows(self, table, date):
+        with self.engine.begin() as conn:
+            float_money_table(table).metadata.create_all(conn)
+            conn.execute(float_money_table(table).insert(), [
+                {'type_id': 1, 'date': date, 'amount': 2000.5, 'fee': 0.0, 'balance': 2000.5,
+                 'raw_body': "You have received 2000.5 RWF", 'status': 'Processed'},
+                {'type_id': 1, 'date': date, 'amount': 0.1, 'fee': 0.2, 'balance': None,
+                 'raw_body': "You have received 0.1 RWF", 'status': 'Processed'},
+            ])
+
+    def column_types(self, conn, name):
+        return {row[1]: row[2] for row in conn.exec_driver_sql(f'PRAGMA table_info({name})')}
+
+    def create_baseline_database(self):
+        create_baseline_database(self.engine, [
+            ('1', 1, '2024-05-10 16:30:51.000000', 2000.5, 0.0, 2000.5, 'Jane Smith', 'You', 'received 2000.5 RWF'),
+            ('2', 2, '2024-05-10 16:31:39.000000', 0.1, 0.2, None, 'You', 'Jane Smith', 'paid 0.1 RWF'),
+        ])
+
+    def assert_integer_rows(self, conn):
+        self.assertEqual(self.column_types(conn, 'transactions')['amount'], 'INTEGER')
+        rows = conn.exec_driver_sql(
+            "SELECT amount, typeof(amount), fee, balance FROM transactions ORDER BY id"
+        ).all()
+        self.assertEqual([tuple(row) for row in rows], [(2001, 'integer', 0, 2001), (0, 'integer', 0, None)])
+        # The indexes come back after the rebuild
+        indexes = [row[1] for row in conn.exec_driver_sql("PRAGMA index_list(transactions)")]
+        self.assertIn('ix_transactions_date', indexes)
+
+    def test_baseline_table_is_converted(self):
+        """Test that a table from the first release, without the counterparty columns, is converted"""
+        self.create_baseline_database()
+        with self.engine.begin() as conn:
+            self.assertEqual(fractional_money_tables(conn), ['transactions'])
+            self.assertEqual(migrate_money_to_integers(conn), ['transactions'])
+            self.assert_integer_rows(conn)
+            self.assertEqual(conn.exec_driver_sql("SELECT COUNT(sender_id) FROM transactions").scalar(), 0)
+
+    def test_create_tables_upgrades_baseline_database(self):
+        """Test that create_tables adds and fills the counterparty columns, then converts amounts"""
+        self.create_baseline_database()
+        create_tables(self.engine)
+        create_tables(self.engine)
+
+        with self.engine.connect() as conn:
+            self.assert_integer_rows(conn)
+            self.assertEqual(fractional_money_tables(conn), [])
+            party_ids = conn.exec_driver_sql("SELECT sender_id, receiver_id FROM transactions ORDER BY id").all()
+            self.assertEqual([tuple(ids) for ids in party_ids], [(1, None), (None, 1)])
+
+    def test_partitions_are_converted(self):
+        """Test that monthly partitions are converted and compacted months stay read-only"""
+        with mock.patch.object(partitions, 'PARTITION_BY_MONTH', True):
+            self.insert_float_rows('transactions_2024_05', datetime(2024, 5, 10))
+            self.insert_float_rows('transactions_2024_06', datetime(2024, 6, 10))
+            with self.engine.begin() as conn:
+                partitions.rebuild_view(conn)
+                partitions.add_read_only_triggers(conn, 'transactions_2024_05')
+
+            create_tables(self.engine)
+
+            with self.engine.connect() as conn:
+                for name in ('transactions_2024_05', 'transactions_2024_06'):
+                    self.assertEqual(self.column_types(conn, name)['balance'], 'INTEGER')
+                self.assertTrue(partitions.is_read_only(conn, '2024-05'))
+                self.assertEqual(conn.execute(select(func.sum(Transaction.amount))).scalar(), 4002)
+
+            with self.assertRaises(DatabaseError):
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql("DELETE FROM transactions_2024_05")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.exc import DatabaseError
+from database import Transaction, partitions
+from database.init_db import create_tables, seed_transaction_types
+from test_support import DatabaseTestCase, make_row
+
+class TestMonthlyPartitions(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch('database.partitions.PARTITION_BY_MONTH', True)
+
+        create_tables(self.engine)
+        db = self.Session()
+        seed_transaction_types(db)
+        db.close()
+
+        with self.engine.begin() as conn:
+            partitions.insert_rows(conn, [
+                make_row(datetime(2024, 5, 10), 100),
+                make_row(datetime(2024, 5, 31, 23, 59), 200),
+                make_row(datetime(2024, 6, 1), 400),
+                make_row(datetime(2024, 7, 15), 800),
+            ])
+
+    def test_rows_are_routed_by_month(self):
+        """Test that each month gets its own table and the view spans all of them"""
+        with self.engine.connect() as conn:
+            self.assertEqual(partitions.list_partitions(conn), ['2024-05', '2024-06', '2024-07'])
+            ids = conn.execute(select(Transaction.id).order_by(Transaction.id)).scalars().all()
+            self.assertEqual(ids, [1, 2, 3, 4])
+            may = conn.exec_driver_sql("SELECT SUM(amount) FROM transactions_2024_05").scalar()
+            self.assertEqual(may, 300)
+            self.assertIs(type(may), int)
+
+    def test_ids_continue_across_partitions(self):
+        """Test that a later insert into an older month continues from the highest ID of any month"""
+        with self.engine.begin() as conn:
+            partitions.insert_rows(conn, [make_row(datetime(2024, 5, 12), 50)])
+            ids = conn.exec_driver_sql("SELECT id FROM transactions_2024_05 ORDER BY id").scalars().all()
+        self.assertEqual(ids, [1, 2, 5])
+
+    def test_date_range_prunes_partitions(self):
+        """Test that a date range only reads the overlapping months"""
+        with self.engine.connect() as conn:
+            source = partitions.transactions_source(conn, datetime(2024, 6, 1), datetime(2024, 6, 30))
+            self.assertIn('transactions_2024_06', str(source))
+            self.assertNotIn('transactions_2024_05', str(source))
+            self.assertEqual(conn.execute(select(func.sum(source.c.amount))).scalar(), 400)
+
+            empty = partitions.transactions_source(conn, datetime(2023, 1, 1), datetime(2023, 12, 31))
+            self.assertEqual(conn.execute(select(func.count()).select_from(empty)).scalar(), 0)
+
+    def test_compacted_months_are_read_only(self):
+        """Test that old months are compacted, locked, and still readable"""
+        with self.engine.begin() as conn:
+            self.assertEqual(partitions.compact_old_partitions(conn, keep_months=1), ['2024-05', '2024-06'])
+            self.assertEqual(partitions.compact_old_partitions(conn, keep_months=1), [])
+
+        # Rows for a locked month are refused before anything is written
+        with self.assertRaisesRegex(ValueError, 'transactions_2024_05'):
+            with self.engine.begin() as conn:
+                partitions.insert_rows(conn, [make_row(datetime(2024, 7, 21), 1), make_row(datetime(2024, 5, 20), 50)])
+        with self.assertRaises(DatabaseError):
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM transactions_2024_05")
+
+        with self.engine.connect() as conn:
+            writable, read_only = partitions.split_read_only(
+                conn, [make_row(datetime(2024, 5, 20), 50), make_row(datetime(2024, 7, 20), 50)]
+            )
+        self.assertEqual([row['date'].month for row in writable], [7])
+        self.assertEqual([row['date'].month for row in read_only], [5])
+
+        with self.engine.begin() as conn:
+            partitions.insert_rows(conn, [make_row(datetime(2024, 7, 20), 50)])
+            self.assertEqual(conn.execute(select(func.sum(Transaction.amount))).scalar(), 1550)
+
+if __name__ == '__main__':
+    unittest.main()
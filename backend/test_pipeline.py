@@ -0,0 +1,110 @@
+import os
+import unittest
+from unittest import mock
+from database import Transaction
+from test_support import DatabaseTestCase
+import pipeline
+
+MORNING_EXPORT = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="3">
+  <sms date="1715351458724" type="1" body="You have received 2000 RWF from Jane Smith. Your new balance:2000 RWF. Ref: 1001" />
+  <sms date="1715351506754" type="1" body="You have received 500 RWF from John Doe. Your new balance:2500 RWF. Ref: 1002" />
+  <sms date="1715369560245" type="1" body="Welcome to MoMo." />
+</smses>
+"""
+
+# Overlaps the morning export by one message
+EVENING_EXPORT = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="2">
+  <sms date="1715351506754" type="1" body="You have received 500 RWF from John Doe. Your new balance:2500 RWF. Ref: 1002" />
+  <sms date="1715380000000" type="1" body="You have received 700 RWF from Jane Smith. Your new balance:3200 RWF. Ref: 1003" />
+</smses>
+"""
+
+# Messages from data/modified_sms_v2.xml: two ID formats, and one without any ID
+REAL_EXPORT = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="4">
+  <sms date="1715351458724" type="1" body="You have received 2000 RWF from Jane Smith (*********013) on your mobile money account at 2024-05-10 16:30:51. Message from sender: . Your new balance:2000 RWF. Financial Transaction Id: 76662021700." />
+  <sms date="1715351506754" type="1" body="TxId: 73214484437. Your payment of 1,000 RWF to Jane Smith 12845 has been completed at 2024-05-10 16:31:39. Your new balance: 1,000 RWF. Fee was 0 RWF.Kanda*182*16# wiyandikishe muri poromosiyo ya BivaMoMotima, ugire amahirwe yo gutsindira ibihembo bishimishije." />
+  <sms date="1715452495316" type="1" body="*165*S*10000 RWF transferred to Samuel Carter (250791666666) from 36521838 at 2024-05-11 20:34:47 . Fee was: 100 RWF. New balance: 28300 RWF. Kugura ama inite cg interineti kuri MoMo, Kanda *182*2*1# .*EN#" />
+  <sms date="1715506895734" type="1" body="*162*TxId:13913173274*S*Your payment of 2000 RWF to Airtime with token  has been completed at 2024-05-12 11:41:28. Fee was 0 RWF. Your new balance: 25280 RWF . Message: - -. *EN#" />
+</smses>
+"""
+
+class TestPipeline(DatabaseTestCase):
+    ENGINE_TARGETS = ('database.init_db.engine',)
+    SESSION_TARGETS = ('pipeline.SessionLocal',)
+
+    def setUp(self):
+        super().setUp()
+        self.export_dir = self.path('exports')
+        os.mkdir(self.export_dir)
+        for name, content in (('morning.xml', MORNING_EXPORT), ('evening.xml', EVENING_EXPORT)):
+            self.write_file(os.path.join('exports', name), content)
+
+    def test_find_exports(self):
+        """Test that a directory and a glob both resolve to the XML files"""
+        expected = [os.path.join(self.export_dir, name) for name in ('evening.xml', 'morning.xml')]
+        self.assertEqual(pipeline.find_exports(self.export_dir), expected)
+        self.assertEqual(pipeline.find_exports(os.path.join(self.export_dir, 'm*.xml')), expected[1:])
+
+    def test_pipeline_loads_all_files(self):
+        """Test that every file is loaded once, with duplicates and unparsed messages counted"""
+        stats = pipeline.run_pipeline(pipeline.find_exports(self.export_dir), readers=2, workers=1)
+
+        self.assertEqual(stats['processed'], 5)
+        self.assertEqual(stats['loaded'], 3)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(stats['failed_files'], 0)
+        self.assertEqual(sorted(f['processed'] for f in stats['per_file']), [2, 3])
+
+        db = self.Session()
+        try:
+            ids = sorted(t.transaction_id for t in db.query(Transaction))
+            self.assertEqual(ids, ['1001', '1002', '1003'])
+        finally:
+            db.close()
+
+    def test_reloading_real_export_adds_nothing(self):
+        """Test that real messages, with or without a transaction ID, are only loaded once"""
+        real_path = self.write_file('real.xml', REAL_EXPORT)
+
+        first = pipeline.run_pipeline([real_path], readers=1, workers=1)
+        second = pipeline.run_pipeline([real_path, real_path], readers=2, workers=1)
+        self.assertEqual(first['loaded'], 4)
+        self.assertEqual(second['loaded'], 0)
+        self.assertEqual(second['duplicates'], 8)
+
+        db = self.Session()
+        try:
+            ids = [t.transaction_id for t in db.query(Transaction).order_by(Transaction.date)]
+            self.assertEqual(ids, ['76662021700', '73214484437', None, '13913173274'])
+        finally:
+            db.close()
+
+    def test_readers_stop_when_the_writer_fails(self):
+        """Test that a failing writer stops the readers instead of letting them stream the rest of the file"""
+        big_path = self.write_file('big.xml', "<smses>\n" + "".join(
+            f'  <sms date="{1715351458724 + i * 1000}" type="1" '
+            f'body="You have received {i + 1} RWF from Jane Smith. Your new balance:{i + 1} RWF." />\n'
+            for i in range(5000)
+        ) + "</smses>\n")
+
+        files = []
+        class RecordingProgress(pipeline.FileProgress):
+            def __init__(self, path):
+                super().__init__(path)
+                files.append(self)
+
+        with mock.patch.object(pipeline, 'FileProgress', RecordingProgress), \
+                mock.patch.object(pipeline, 'CHUNK_SIZE', 10), \
+                mock.patch.object(pipeline, 'insert_transaction_rows', side_effect=RuntimeError('disk full')):
+            with self.assertRaisesRegex(RuntimeError, 'disk full'):
+                pipeline.run_pipeline([big_path], readers=1, workers=1)
+
+        # The queue holds two chunks, so the reader gets only a few chunks ahead before stopping
+        self.assertLess(files[0].processed, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, Transaction, TransactionType
+from database.init_db import seed_transaction_types
+from reconcile import reconcile_balances
+
+class TestReconcileBalances(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.db = sessionmaker(bind=engine)()
+        seed_transaction_types(self.db)
+        self.types = {t.name: t.id for t in self.db.query(TransactionType).all()}
+        self.start = datetime(2024, 5, 10, 9, 0, 0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def add(self, minutes, type_name, amount, balance, fee=0):
+        self.db.add(Transaction(
+            type_id=self.types[type_name],
+            date=self.start + timedelta(minutes=minutes),
+            amount=amount,
+            fee=fee,
+            balance=balance,
+            raw_body=f"{type_name} {amount} RWF",
+            status='Processed'
+        ))
+        self.db.commit()
+
+    def test_consistent_chain_has_no_gaps(self):
+        """Test that credits, debits with fees and unclassified rows reconcile"""
+        self.add(0, 'Incoming Money', 2000, 2000)
+        self.add(1, 'Transfers to Mobile Numbers', 500, 1400, fee=100)
+        self.add(2, 'Unknown', 400, 1000)
+        self.add(3, 'Unknown', 250, 1250)
+
+        report = reconcile_balances(self.db)
+        self.assertEqual(report['checked'], 3)
+        self.assertEqual(report['gap_count'], 0)
+
+    def test_missing_message_is_flagged(self):
+        """Test that a skipped message shows up as a gap"""
+        self.add(0, 'Incoming Money', 2000, 2000)
+        # A 300 RWF payment between these two was never received
+        self.add(2, 'Payments to Code Holders', 200, 1500)
+        self.add(3, 'Incoming Money', 500, 2000)
+
+        report = reconcile_balances(self.db)
+        self.assertEqual(report['gap_count'], 1)
+        gap = report['gaps'][0]
+        self.assertEqual(gap['expected_balance'], 1800)
+        self.assertEqual(gap['balance'], 1500)
+        self.assertEqual(gap['discrepancy'], -300)
+        for field in ('expected_balance', 'balance', 'discrepancy'):
+            self.assertIs(type(gap[field]), int)
+
+if __name__ == '__main__':
+    unittest.main()
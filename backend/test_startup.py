@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Seconds allowed for `import app`, which builds the app and warms the engine.
+# Flask and the SQLAlchemy ORM account for most of it; override on slow machines.
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', '1.5'))
+
+# Modules only needed by specific endpoints, which must not load on startup
+LAZY_MODULES = ['reconcile', 'ingest', 'process_sms', 'xml.etree.ElementTree']
+
+MEASURE_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+class TestStartup(unittest.TestCase):
+    def measure_import(self):
+        """Import app in a fresh interpreter and report what it cost"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}",
+                PYTHONPATH=os.path.dirname(os.path.abspath(__file__))
+            )
+            # Run from an empty directory so stray log files would show up
+            output = subprocess.run(
+                [sys.executable, '-c', MEASURE_IMPORT],
+                cwd=tmp_dir,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir, 'sms_processing.log')))
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_import_time_budget(self):
+        """Test that importing the app stays within the cold-start budget"""
+        # Best of three, so one noisy run does not fail the build
+        elapsed = min(self.measure_import()['elapsed'] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
+
+    def test_endpoint_modules_are_lazy(self):
+        """Test that endpoint-only modules are not imported on startup"""
+        self.assertEqual(self.measure_import()['loaded'], [])
+
+if __name__ == '__main__':
+    unittest.main()
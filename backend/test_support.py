@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy.orm import sessionmaker
+from database.init_db import create_tables, seed_transaction_types, attach_counterparty_ids, insert_transaction_rows
+from database.models.base import create_database_engine
+
+def make_row(date, amount, **values):
+    """Column values for one transaction, as build_transaction_row returns them"""
+    return {
+        'transaction_id': None, 'type_id': 1, 'date': date, 'amount': amount, 'fee': 0,
+        'balance': None, 'sender': None, 'receiver': None, 'sender_id': None, 'receiver_id': None,
+        'raw_body': f"You have received {amount} RWF", 'status': 'Processed', **values
+    }
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Base for tests that need a real SQLite file rather than an in-memory database.
+
+    Each test gets a throwaway database in a temporary directory. The module
+    attributes named in ENGINE_TARGETS and SESSION_TARGETS (mock.patch targets)
+    are pointed at its engine and session factory for the length of the test.
+    """
+    ENGINE_TARGETS = ()
+    SESSION_TARGETS = ()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.engine = create_database_engine(f"sqlite:///{self.path('test.db')}")
+        self.addCleanup(self.engine.dispose)
+        self.Session = sessionmaker(bind=self.engine)
+
+        for target in self.ENGINE_TARGETS:
+            self.patch(target, self.engine)
+        for target in self.SESSION_TARGETS:
+            self.patch(target, self.Session)
+
+    def path(self, name):
+        """A path inside the test's temporary directory"""
+        return os.path.join(self.tmp_dir.name, name)
+
+    def write_file(self, name, content):
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(content)
+        return self.path(name)
+
+    def patch(self, target, value):
+        """Replace target with value until the test ends"""
+        patcher = mock.patch(target, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class ApiTestCase(DatabaseTestCase):
+    """DatabaseTestCase with a Flask test client whose requests use the test database"""
+    ENGINE_TARGETS = ('database.models.base.engine', 'database.init_db.engine')
+    SESSION_TARGETS = ('database.models.base.SessionLocal',)
+    PARTITION_BY_MONTH = False
+
+    def setUp(self):
+        super().setUp()
+        self.patch('database.partitions.PARTITION_BY_MONTH', self.PARTITION_BY_MONTH)
+        create_tables(self.engine)
+        db = self.Session()
+        try:
+            seed_transaction_types(db)
+        finally:
+            db.close()
+
+        # Imported here so the module-level app warms the test engine rather than the default database
+        import app
+        self.client = app.create_app().test_client()
+
+    def add_rows(self, rows):
+        """Store transaction rows the way the loaders do, interning their counterparties"""
+        db = self.Session()
+        try:
+            attach_counterparty_ids(db, rows, {})
+            insert_transaction_rows(db, rows)
+            db.commit()
+        finally:
+            db.close()